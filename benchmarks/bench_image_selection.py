@@ -0,0 +1,62 @@
+"""
+Benchmark the image_link column for variations with many images.
+
+Every variation has dozens of images in random order and only every
+third image is available for the Facebook referrer, so the image with
+the lowest position usually doesn't match. The matching image with the
+lowest position is selected within a single pass over the images, which
+only checks the availabilities of images with a lower position than the
+current match, so the duration grows at most linearly with the amount
+of images.
+"""
+import random
+
+import facebook_feed_sync.packages.shared_data as shared
+from facebook_feed_sync.packages.plenty import get_data_from_plentymarkets
+from facebook_feed_sync.packages.records import to_records
+
+from benchmarks.common import (
+    build_catalog, setup_shared, measure, report_scaling
+)
+
+
+VARIATION_COUNT = 5000
+IMAGE_COUNTS = [12, 24, 48, 96]
+
+
+def add_images(variations: list, image_count: int) -> None:
+    """ Attach @image_count images in random order to every variation """
+    generator = random.Random(image_count)
+    for var in variations:
+        positions = list(range(image_count))
+        generator.shuffle(positions)
+        var['images'] = [
+            {'position': position,
+             'url': f"https://test_image.com/{var['id']}_{position}.jpg",
+             'availabilities': [
+                 {'type': 'marketplace',
+                  'value': 4.01 if position % 3 == 2 else 5},
+                 {'type': 'mandant', 'value': 12345}]}
+            for position in positions]
+
+
+def main():
+    results = []
+    for image_count in IMAGE_COUNTS:
+        catalog = build_catalog(variation_count=VARIATION_COUNT)
+        add_images(variations=catalog['variations'], image_count=image_count)
+        setup_shared(catalog=catalog)
+        # The CLI parses the variations into records once per run
+        shared.plenty_variations = to_records(
+            variations=catalog['variations'])
+        shared.img_match_criteria = {'type': 'marketplace', 'value': '4.01'}
+        duration = measure(lambda: get_data_from_plentymarkets(
+            header=['id', 'image_link']))
+        results.append((image_count, duration))
+    report_scaling(
+        name=f'image_link column ({VARIATION_COUNT} variations, images per '
+             'variation)', results=results)
+
+
+if __name__ == '__main__':
+    main()
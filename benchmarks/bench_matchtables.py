@@ -0,0 +1,29 @@
+"""
+Benchmark the creation of the match tables in ColumnValuesFiller.
+
+The item and brand match tables are built with id-keyed indexes, so the
+duration should roughly double with a doubled catalog size.
+"""
+from facebook_feed_sync.packages.plenty import ColumnValuesFiller
+
+from benchmarks.common import (
+    build_catalog, setup_shared, measure, report_scaling
+)
+
+
+SIZES = [5000, 10000, 20000, 40000]
+
+
+def main():
+    results = []
+    for size in SIZES:
+        catalog = build_catalog(variation_count=size)
+        setup_shared(catalog=catalog)
+        duration = measure(lambda: ColumnValuesFiller(
+            variations=catalog['variations'], header=['id', 'brand']))
+        results.append((size, duration))
+    report_scaling(name='build_matchtables (variations)', results=results)
+
+
+if __name__ == '__main__':
+    main()
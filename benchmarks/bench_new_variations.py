@@ -0,0 +1,43 @@
+"""
+Benchmark adding many new variations at once to the google sheet, e.g.
+after a seasonal catalog import.
+
+Half of the variations of the catalog are missing in the google sheet.
+The new variations are located with set based membership checks and
+without copies of the variations or the PlentyMarkets frame, so the
+duration should roughly double with a doubled catalog size.
+"""
+import pandas
+from loguru import logger
+
+from facebook_feed_sync.packages.gsheet import GSHEET_HEADER, add_new_items
+
+from benchmarks.common import (
+    build_catalog, setup_shared, measure, report_scaling
+)
+
+
+SIZES = [5000, 10000, 20000, 40000]
+
+
+def main():
+    # The synthetic catalog has no attributes, which is reported as error
+    logger.disable('facebook_feed_sync')
+    results = []
+    for size in SIZES:
+        catalog = build_catalog(variation_count=size)
+        setup_shared(catalog=catalog)
+        numbers = [var['number'] for var in catalog['variations']]
+        plenty = pandas.DataFrame({'id': numbers})
+        google = pandas.DataFrame(
+            [[number] + [''] * (len(GSHEET_HEADER) - 1)
+             for number in numbers[:size // 2]], columns=GSHEET_HEADER)
+        duration = measure(lambda: add_new_items(google=google,
+                                                 plenty=plenty))
+        results.append((size, duration))
+    report_scaling(name='add_new_items (variations, half of them new)',
+                   results=results)
+
+
+if __name__ == '__main__':
+    main()
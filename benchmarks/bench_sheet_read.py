@@ -0,0 +1,72 @@
+"""
+Benchmark the conversion of the google sheet values into a DataFrame.
+
+Compares the previous path (gspread get_all_records: numeric conversion
+and a dict per row, followed by pandas.DataFrame(..., dtype=str)) with
+parse_sheet_values, which backs the DataFrame with a single array of the
+raw cell values. Reports the duration and the peak of the allocated
+memory.
+"""
+import tracemalloc
+
+import pandas
+from gspread.utils import numericise_all, to_records
+
+from facebook_feed_sync.packages.gsheet import (
+    GSHEET_HEADER, parse_sheet_values
+)
+
+from benchmarks.common import measure, report_scaling
+
+
+SIZES = [12500, 25000, 50000]
+
+
+def build_sheet_values(row_count: int) -> list:
+    """ Create the cell values of a feed sheet with @row_count rows """
+    values = [list(GSHEET_HEADER)]
+    for row in range(row_count):
+        number = 100000 + row
+        values.append([
+            f'{number}x', f'Artikel {row // 4}',
+            f'Beschreibung des Artikels {row // 4} ' * 8,
+            'in stock', str(row % 30), 'new', f'{row % 90 + 9},90 EUR',
+            f'https://shop.example.com/item/{row // 4}?number={number}',
+            f'https://cdn.example.com/images/{number}.jpg',
+            f'Manufacturer_{row % 50}',
+            'Apparel & Accessories > Clothing > Shirts & Tops', '', '',
+            str(row // 4), 'unisex', 'black', 'M', 'adult', 'cotton', '', '',
+            '', '157 g'])
+    return values
+
+
+def read_records(values: list) -> pandas.DataFrame:
+    """ Previous path: get_all_records and a DataFrame from the records """
+    rows = [numericise_all(row) for row in values[1:]]
+    return pandas.DataFrame(to_records(values[0], rows), dtype=str)
+
+
+def peak_memory(function) -> float:
+    """ Return the peak of the memory allocated by @function in MiB """
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main():
+    for name, function in [('get_all_records', read_records),
+                           ('parse_sheet_values', parse_sheet_values)]:
+        results = []
+        for size in SIZES:
+            values = build_sheet_values(row_count=size)
+            duration = measure(lambda: function(values))
+            results.append((size, duration))
+        report_scaling(name=f'{name} (rows)', results=results)
+        print(f'peak memory at {SIZES[-1]} rows: '
+              f'{peak_memory(lambda: function(values)):.1f} MiB\n')
+
+
+if __name__ == '__main__':
+    main()
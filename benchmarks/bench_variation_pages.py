@@ -0,0 +1,39 @@
+"""
+Benchmark the variation download with sequential and concurrent page
+requests against a local stand-in server with an artificial latency.
+"""
+import unittest.mock
+
+from facebook_feed_sync.packages import fetch
+
+from benchmarks.common import build_catalog, measure
+from tests.stand_in_server import StandInPlentyServer
+
+
+VARIATION_COUNT = 5000
+LATENCY = 0.05
+WORKERS = [1, 2, 4, 8]
+
+
+def main():
+    variations = build_catalog(variation_count=VARIATION_COUNT)['variations']
+    with StandInPlentyServer(variations=variations,
+                             latency=LATENCY) as server:
+        api = unittest.mock.Mock()
+        api.url = server.url
+        api.creds = {'Authorization': 'Bearer token'}
+        query = fetch.build_query(refine={'isActive': True})
+        print(f'{VARIATION_COUNT} variations, {LATENCY * 1000:.0f} ms '
+              'latency per page')
+        baseline = 0.0
+        for workers in WORKERS:
+            duration = measure(lambda: fetch.request_all_pages(
+                api=api, route=fetch.VARIATION_ROUTE, query=query,
+                workers=workers), repeat=1)
+            baseline = baseline or duration
+            print(f'{workers:>3} workers {duration * 1000:>10.2f} ms  '
+                  f'x{baseline / duration:.2f} speedup')
+
+
+if __name__ == '__main__':
+    main()
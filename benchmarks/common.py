@@ -0,0 +1,113 @@
+"""
+Shared helpers for the benchmark scripts.
+
+The benchmarks generate synthetic PlentyMarkets API responses, so they
+can be run without access to a live system:
+    python -m benchmarks.<name>
+"""
+import time
+import unittest.mock
+
+import plenty_api
+
+import facebook_feed_sync.packages.shared_data as shared
+import facebook_feed_sync.packages.fetch as fetch
+
+
+def build_catalog(variation_count: int, variations_per_item: int = 5,
+                  manufacturer_count: int = 50) -> dict:
+    """
+    Create a synthetic catalog with matching variations, items and
+    manufacturers.
+
+    Parameter:
+        variation_count     [int]   -   number of variations
+        variations_per_item [int]   -   variations sharing one parent item
+        manufacturer_count  [int]   -   number of manufacturers
+
+    Return:
+                            [dict]  -   'variations', 'items' and
+                                        'manufacturers' responses
+    """
+    item_count = max(1, variation_count // variations_per_item)
+    manufacturers = [{'id': i, 'name': f'Manufacturer_{i}', 'position': i}
+                     for i in range(1, manufacturer_count + 1)]
+    items = []
+    for item_id in range(1, item_count + 1):
+        items.append({
+            'id': item_id,
+            'manufacturerId': item_id % manufacturer_count + 1,
+            'itemProperties': [],
+            'texts': [{'lang': 'de', 'name1': f'Artikel {item_id}',
+                       'name2': '', 'name3': '',
+                       'description': f'<p>Beschreibung {item_id}</p>'}]
+        })
+    variations = []
+    for var_id in range(1, variation_count + 1):
+        variations.append({
+            'id': var_id,
+            'itemId': (var_id - 1) % item_count + 1,
+            'number': f'{var_id}x',
+            'isMain': False,
+            'weightG': 100,
+            'images': [],
+            'properties': [],
+            'stock': [{'warehouseId': 1, 'netStock': var_id % 20 - 2}],
+            'variationSalesPrices': [{'salesPriceId': 1,
+                                      'price': 10 + var_id % 100 / 10}],
+            'variationAttributeValues': []
+        })
+    return {'variations': variations, 'items': items,
+            'manufacturers': manufacturers}
+
+
+def setup_shared(catalog: dict) -> unittest.mock.Mock:
+    """ Point the shared data module to a mocked API serving the catalog """
+    shared.lang = 'de'
+    shared.item_name_number = 1
+    shared.warehouse_id = 1
+    shared.price_id = 1
+    shared.plenty_variations = catalog['variations']
+    mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+    # The items are requested by the fetch module instead of plenty_api
+    items = {item['id']: item for item in catalog['items']}
+    fetch.get_items = unittest.mock.Mock(
+        side_effect=lambda api, refine, **kwargs: [
+            items[int(item_id)] for item_id in refine['id'].split(',')
+            if int(item_id) in items])
+    mock_plenty.plenty_api_get_manufacturers.return_value =\
+        catalog['manufacturers']
+    shared.plenty_api_instance = mock_plenty
+    return mock_plenty
+
+
+def measure(function, repeat: int = 3) -> float:
+    """ Return the best wall time of @repeat calls to @function """
+    best = -1.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        duration = time.perf_counter() - start
+        if best < 0 or duration < best:
+            best = duration
+    return best
+
+
+def report_scaling(name: str, results: list) -> None:
+    """
+    Print the duration per size and the growth factor compared to the
+    previous size, a linear step doubles its duration with a doubled size.
+
+    Parameter:
+        name        [str]   -   title of the benchmark
+        results     [list]  -   tuples of (size, duration in seconds)
+    """
+    print(name)
+    previous = None
+    for size, duration in results:
+        growth = ''
+        if previous:
+            growth = (f'  x{duration / previous[1]:.2f} time for '
+                      f'x{size / previous[0]:.2f} size')
+        print(f'{size:>8} {duration * 1000:>10.2f} ms{growth}')
+        previous = (size, duration)
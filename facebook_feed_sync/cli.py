@@ -28,7 +28,14 @@ import plenty_api
 from loguru import logger
 
 import facebook_feed_sync.packages.shared_data as shared
-from facebook_feed_sync.packages import gsheet, plenty
+from facebook_feed_sync.packages import gsheet, plenty, fetch
+from facebook_feed_sync.packages.cache import (
+    ReferenceCache, VariationSnapshot, DEFAULT_TTL
+)
+from facebook_feed_sync.packages.scheduler import (
+    RequestScheduler, ScheduledPlentyApi, DEFAULT_RESERVE
+)
+from facebook_feed_sync.packages.records import parse_variations
 
 
 PROG_NAME = 'facebook_feed_sync'
@@ -45,6 +52,10 @@ if not os.path.exists(BASE_PATH):
     os.mkdir(BASE_PATH)
 
 CONFIG_PATH = os.path.join(BASE_PATH, 'config.ini')
+CACHE_PATH = os.path.join(BASE_PATH, 'cache')
+# Optional options of the Mapping section for the price column
+PRICE_FORMAT_OPTIONS = ['currency', 'decimal_separator',
+                        'thousands_separator']
 
 
 HEADER_SYNC_MAP = {
@@ -72,6 +83,19 @@ def setup_argparser():
                                  'text', 'link', 'all'],
                         dest='synctype',
                         required=False)
+    parser.add_argument('--refresh', '-r', required=False,
+                        help='Ignore cached PlentyMarkets data',
+                        action='store_true', dest='refresh')
+    parser.add_argument('--write-mode', '-w', required=False,
+                        help='Write the whole sheet, only the changed '
+                        'cells or only the synchronized columns',
+                        choices=['full', 'diff', 'columns'], default='full',
+                        dest='write_mode')
+    parser.add_argument('--read-mode', required=False,
+                        help='Read the whole sheet or only the id column '
+                        'and the synchronized columns',
+                        choices=['full', 'columns'], default='full',
+                        dest='read_mode')
 
     namespace = parser.parse_args()
     return namespace
@@ -205,6 +229,127 @@ def get_config_credentials(config: configparser.ConfigParser) -> dict:
             'pw': config['Credentials']['pw_file']}
 
 
+def get_config_cache_ttl(config: configparser.ConfigParser) -> dict:
+    """
+    Read the optional time to live values of the cache.
+
+    The section can contain the options items_ttl, manufacturers_ttl and
+    attributes_ttl, each as number of minutes (0 disables the cache).
+    """
+    ttl: dict = {}
+    if not config.has_section(section='Cache'):
+        return ttl
+
+    for entity in DEFAULT_TTL:
+        option = entity + '_ttl'
+        if not config.has_option(section='Cache', option=option):
+            continue
+        try:
+            ttl[entity] = int(config['Cache'][option])
+        except ValueError:
+            logger.warning(f"Invalid value for {option} in the Cache section"
+                           f", use the default: {DEFAULT_TTL[entity]}")
+    return ttl
+
+
+def get_config_workers(config: configparser.ConfigParser) -> int:
+    """
+    Read the optional maximum amount of concurrent API requests.
+
+    The option workers within the General section defaults to 1, which
+    performs all requests one after another.
+    """
+    if not config.has_option(section='General', option='workers'):
+        return 1
+    try:
+        return max(1, int(config['General']['workers']))
+    except ValueError:
+        logger.warning("Invalid value for workers in the General section, "
+                       "perform the requests one after another.")
+        return 1
+
+
+def get_config_call_reserve(config: configparser.ConfigParser) -> int:
+    """
+    Read the optional amount of API calls per call limit period, which
+    are left to other tools using the same PlentyMarkets account.
+    """
+    if not config.has_option(section='General', option='call_reserve'):
+        return DEFAULT_RESERVE
+    try:
+        return max(0, int(config['General']['call_reserve']))
+    except ValueError:
+        logger.warning("Invalid value for call_reserve in the General "
+                       f"section, use the default: {DEFAULT_RESERVE}")
+        return DEFAULT_RESERVE
+
+
+def get_config_price_format(config: configparser.ConfigParser) -> dict:
+    """
+    Read the optional currency and separators of the price column.
+
+    The options currency, decimal_separator and thousands_separator within
+    the Mapping section default to the format: 1234,50 EUR. Values can be
+    quoted to keep whitespace (e.g. thousands_separator=" ").
+    """
+    price_format: dict = {}
+    for option in PRICE_FORMAT_OPTIONS:
+        if config.has_option(section='Mapping', option=option):
+            price_format[option] = config['Mapping'][option].strip('"\'')
+    return price_format
+
+
+def get_config_full_sync_interval(config: configparser.ConfigParser) -> int:
+    """
+    Read the optional interval between two full variation downloads.
+
+    A value above 0 for the option full_sync_interval within the Cache
+    section enables the incremental download of variations.
+    """
+    if not config.has_option(section='Cache', option='full_sync_interval'):
+        return 0
+    try:
+        return int(config['Cache']['full_sync_interval'])
+    except ValueError:
+        logger.warning("Invalid value for full_sync_interval in the Cache "
+                       "section, download all variations on every run.")
+        return 0
+
+
+def get_variations(api: plenty_api.PlentyApi, referrer: str,
+                   resources: list, snapshot: VariationSnapshot = None,
+                   interval: int = 0, refresh: bool = False) -> list:
+    """
+    Fetch all active non-main variations of the referrer.
+
+    Parameter:
+        api         [PlentyApi] -   API instance
+        referrer    [str]       -   ID of the facebook referrer
+        resources   [list]      -   variation sub-resources to include
+        snapshot    [VariationSnapshot] - only download changed variations
+                                    and merge them into the snapshot
+        interval    [int]       -   minutes between two full downloads
+                                    of the snapshot
+        refresh     [bool]      -   force a full download of the snapshot
+
+    Return:
+                    [list]      -   variations, empty list on failure
+    """
+    refine = {'referrerId': referrer, 'isActive': True}
+    if snapshot:
+        variations = fetch.get_variations_incremental(
+            api=api, snapshot=snapshot, interval=interval, refine=refine,
+            additional=resources, lang=shared.lang, refresh=refresh,
+            workers=shared.max_workers)
+    else:
+        variations = fetch.get_variations(
+            api=api, refine=refine, additional=resources, lang=shared.lang,
+            workers=shared.max_workers)
+    if not variations:
+        return []
+    return [var for var in variations if not var['isMain']]
+
+
 def cli():
     parser = setup_argparser()
     verbose = logger.info if parser.verbose else lambda *a, **k: None
@@ -236,6 +381,8 @@ def cli():
         logger.error("Invalid configuration.")
         sys.exit(1)
 
+    shared.price_format = get_config_price_format(config=config)
+
     if not parser.synctype:
         logger.error("Specify the sync type: [inventory, price, text, "
                      "attribute, link, all].")
@@ -246,26 +393,76 @@ def cli():
     sheet = google_account.open_by_key(config['General']['google_sheet_id'])
     worksheet = sheet.get_worksheet(0)
 
+    header = HEADER_SYNC_MAP[parser.synctype]
+    read_columns = None
+    if parser.read_mode == 'columns' and parser.synctype != 'all':
+        read_columns = header
+        if parser.write_mode != 'columns':
+            logger.warning("Reading only a part of the columns requires "
+                           "the columns write mode, use it.")
+            parser.write_mode = 'columns'
+
     verbose("Read the google-sheet.")
-    google = gsheet.gsheet_read(worksheet=worksheet)
+    google = gsheet.gsheet_read(worksheet=worksheet, columns=read_columns)
+    # The sheet as read, to find the changed cells or rows
+    original = None
+    if parser.write_mode != 'full':
+        original = google.copy()
 
     verbose("Get all Plentymarkets variations through the API.")
-    variations = api.plenty_api_get_variations(
-        refine={'referrerId': config['Mapping']['facebook_referrer'],
-                'isActive': True},
-        additional=['properties', 'images', 'variationAttributeValues',
-                    'stock', 'variationSalesPrices'],
-        lang=shared.lang
-    )
+    referrer = config['Mapping']['facebook_referrer']
+    resources = plenty.get_variation_resources(header=header)
+    full_resources = plenty.get_variation_resources(
+        header=gsheet.GSHEET_HEADER)
+    snapshot = None
+    interval = get_config_full_sync_interval(config=config)
+    if interval > 0:
+        verbose("Only download variations changed since the last run.")
+        # The snapshot is shared by all sync types
+        resources = full_resources
+        snapshot = VariationSnapshot(
+            path=os.path.join(CACHE_PATH, f'variations_{referrer}.json'))
+    shared.max_workers = get_config_workers(config=config)
+    # Queue all requests according to the call limits of the account
+    api = ScheduledPlentyApi(
+        api=api, scheduler=RequestScheduler(
+            max_workers=shared.max_workers,
+            reserve=get_config_call_reserve(config=config)))
+    shared.plenty_api_instance = api
+    shared.reference_cache = ReferenceCache(
+        path=CACHE_PATH, ttl=get_config_cache_ttl(config=config),
+        refresh=parser.refresh)
+
+    # Manufacturers and attributes don't depend on the variations and are
+    # fetched together with them, the items require the variations.
+    tasks = plenty.get_reference_requests(header=header)
+    tasks['variations'] = lambda: get_variations(
+        api=api, referrer=referrer, resources=resources, snapshot=snapshot,
+        interval=interval, refresh=parser.refresh)
+    responses = fetch.run_parallel(tasks=tasks, workers=shared.max_workers)
+    variations = responses.pop('variations')
     if not variations:
         sys.exit(1)
-    variations = [var for var in variations if not var['isMain']]
-    shared.plenty_variations = variations
-    shared.plenty_api_instance = api
+    shared.reference_data = responses
+    # Build the match tables at most once, even if new variations are
+    # filled with all columns afterwards
+    shared.match_tables = plenty.MatchTables()
+
+    # New variations are added with all columns, which requires every
+    # sub-resource and not just the ones of the sync type
+    known_ids = set(google['id']) if 'id' in google.columns else set()
+    if (any(var['number'] not in known_ids for var in variations) and
+            resources != full_resources):
+        verbose("New variations found, fetch all variation data.")
+        variations = get_variations(api=api, referrer=referrer,
+                                    resources=full_resources)
+        if not variations:
+            sys.exit(1)
+    # Keep only the fields read by the columns and drop the raw response
+    shared.plenty_variations = parse_variations(variations=variations)
 
     verbose("Fetch necessary data for the specified sync type.")
-    sync = plenty.get_data_from_plentymarkets(
-        header=HEADER_SYNC_MAP[parser.synctype])
+    sync = plenty.get_data_from_plentymarkets(header=header)
 
     verbose("Check if new variations were added in Plentymarkets.")
     google = gsheet.add_new_items(google=google, plenty=sync)
@@ -276,6 +473,12 @@ def cli():
 
     if len(google.index) > 0:
         verbose("Write the changes to the google-sheet.")
-        gsheet.gsheet_write(worksheet=worksheet, dataframe=google)
+        gsheet.gsheet_write(
+            worksheet=worksheet, dataframe=google, original=original,
+            columns=header if parser.write_mode == 'columns' else None)
         verbose("Resize the google-sheet to it's current size.")
         worksheet.resize(rows=len(google.index)+1)
+
+    if snapshot:
+        verbose("Save the variation snapshot.")
+        snapshot.save()
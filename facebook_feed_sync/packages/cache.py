@@ -0,0 +1,342 @@
+"""
+Synchronize a google sheet with data from PlentyMarkets.
+The google sheet is used as a data feed for a facebook product catalog.
+
+Copyright (C) 2020  Sebastian Fricke, Panasiam
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Persist responses of rarely changing PlentyMarkets resources (items,
+manufacturers, attributes) and a snapshot of the variations between runs,
+to save API calls.
+"""
+import json
+import os
+import os.path
+import time
+from loguru import logger
+
+import facebook_feed_sync.packages.shared_data as shared
+
+
+# Default time to live of each cached entity in minutes
+DEFAULT_TTL = {
+    'items':            60,
+    'manufacturers':    1440,
+    'attributes':       1440
+}
+
+
+class ReferenceCache():
+    """
+    Store API responses as JSON files and expire them after a TTL.
+
+    Every entity type (items, manufacturers, attributes) has its own
+    time to live, an entity with a TTL of 0 is never cached.
+    """
+    def __init__(self, path: str, ttl: dict = None, refresh: bool = False):
+        """
+        Parameter:
+            path        [str]   -   folder for the cache files
+            ttl         [dict]  -   time to live in minutes per entity
+            refresh     [bool]  -   ignore stored responses, but replace
+                                    them with fresh ones
+        """
+        self.path: str = path
+        self.ttl: dict = dict(DEFAULT_TTL)
+        if ttl:
+            self.ttl.update(ttl)
+        self.refresh: bool = refresh
+
+    def file_path(self, entity: str, key: str = '') -> str:
+        name = f'{entity}_{key}' if key else entity
+        return os.path.join(self.path, name + '.json')
+
+    def load(self, entity: str, key: str = ''):
+        """
+        Get a stored response, if it exists and did not expire.
+
+        Parameter:
+            entity      [str]   -   name of the entity type
+            key         [str]   -   variant of the request (e.g. language)
+
+        Return:
+                        [list/dict/None] - stored response or None
+        """
+        content = self.load_with_timestamp(entity=entity, key=key)
+        if not content:
+            return None
+        return content[1]
+
+    def load_with_timestamp(self, entity: str, key: str = '') -> tuple:
+        """
+        Get a stored response together with the time it was stored.
+
+        Return:
+                        [tuple/None] - (timestamp, response) or None
+        """
+        if self.refresh or self.ttl.get(entity, 0) <= 0:
+            return None
+
+        path = self.file_path(entity=entity, key=key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path, mode='r', encoding='utf-8') as cache_file:
+                content = json.load(cache_file)
+            timestamp = content['timestamp']
+            data = content['data']
+            age = time.time() - timestamp
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning(f"Invalid cache file {path}, ignore it.")
+            return None
+
+        if age < 0 or age > self.ttl[entity] * 60:
+            return None
+        return (timestamp, data)
+
+    def store(self, entity: str, data, key: str = '',
+              timestamp: float = 0) -> None:
+        """
+        Save a response together with the current time.
+
+        Parameter:
+            entity      [str]   -   name of the entity type
+            data        [list/dict] - JSON serializable API response
+            key         [str]   -   variant of the request (e.g. language)
+            timestamp   [float] -   keep the age of an extended response
+        """
+        if self.ttl.get(entity, 0) <= 0:
+            return
+
+        path = self.file_path(entity=entity, key=key)
+        temp_path = path + '.tmp'
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(temp_path, mode='w', encoding='utf-8') as cache_file:
+                json.dump({'timestamp': timestamp or time.time(),
+                           'data': data}, cache_file)
+            os.replace(temp_path, path)
+        except (OSError, TypeError, ValueError):
+            logger.warning(f"Unable to write the cache file {path}.")
+
+    def get(self, entity: str, request, key: str = '',
+            refresh: bool = False):
+        """
+        Return the stored response or perform the request and store it.
+
+        Failed requests (empty responses) are not stored.
+
+        Parameter:
+            entity      [str]   -   name of the entity type
+            request     [callable] - performs the API request
+            key         [str]   -   variant of the request (e.g. language)
+            refresh     [bool]  -   ignore the stored response, e.g. when
+                                    it lacks an entry referenced by newer
+                                    data, but replace it with the fresh one
+
+        Return:
+                        [list/dict/None] - API response
+        """
+        if not refresh:
+            data = self.load(entity=entity, key=key)
+            if data:
+                return data
+
+        data = request()
+        if data:
+            self.store(entity=entity, data=data, key=key)
+        return data
+
+    def get_by_id(self, entity: str, ids: list, request, key: str = '',
+                  refresh: bool = False):
+        """
+        Return the stored entries with the given IDs and request only the
+        missing ones.
+
+        The requested entries are added to the stored response, without
+        changing its age, so that all entries expire together.
+
+        Parameter:
+            entity      [str]   -   name of the entity type
+            ids         [list]  -   IDs of the required entries
+            request     [callable] - performs the API request for a list
+                                    of IDs
+            key         [str]   -   variant of the request (e.g. language)
+            refresh     [bool]  -   request all of the given IDs, e.g.
+                                    when a stored entry lacks values
+                                    referenced by newer data
+
+        Return:
+                        [list/None] - entries, None if the request failed
+        """
+        content = self.load_with_timestamp(entity=entity, key=key)
+        timestamp, stored = content if content else (0, [])
+        index = {entry['id']: entry for entry in stored}
+        missing = [entry_id for entry_id in ids
+                   if refresh or entry_id not in index]
+        if missing:
+            data = request(missing)
+            if not data:
+                return data
+            index.update({entry['id']: entry for entry in data})
+            self.store(entity=entity, data=list(index.values()), key=key,
+                       timestamp=timestamp)
+        return [index[entry_id] for entry_id in ids if entry_id in index]
+
+
+def cached_request(entity: str, request, key: str = '',
+                   refresh: bool = False):
+    """
+    Perform the request through the shared cache, if one is configured.
+
+    Parameter:
+        entity      [str]       -   name of the entity type
+        request     [callable]  -   performs the API request
+        key         [str]       -   variant of the request (e.g. language)
+        refresh     [bool]      -   bypass the stored response
+
+    Return:
+                    [list/dict/None] - API response
+    """
+    if shared.reference_cache is None:
+        return request()
+    return shared.reference_cache.get(entity=entity, request=request,
+                                      key=key, refresh=refresh)
+
+
+def cached_request_by_id(entity: str, ids: list, request, key: str = '',
+                         refresh: bool = False):
+    """
+    Request the entries with the given IDs through the shared cache, if
+    one is configured.
+
+    Parameter:
+        entity      [str]       -   name of the entity type
+        ids         [list]      -   IDs of the required entries
+        request     [callable]  -   performs the API request for a list
+                                    of IDs
+        key         [str]       -   variant of the request (e.g. language)
+        refresh     [bool]      -   bypass the stored entries
+
+    Return:
+                    [list/None] -   API response
+    """
+    if shared.reference_cache is None:
+        return request(ids)
+    return shared.reference_cache.get_by_id(entity=entity, ids=ids,
+                                            request=request, key=key,
+                                            refresh=refresh)
+
+
+class VariationSnapshot():
+    """
+    Local copy of all variations of the referrer, kept up to date by
+    merging the variations that changed since the last successful run.
+
+    The high-water mark (@watermark) is the start time of the latest fetch,
+    it is only written to disk with save(), which should be called after a
+    successful synchronization.
+    """
+    def __init__(self, path: str):
+        """
+        Parameter:
+            path        [str]   -   location of the snapshot file
+        """
+        self.path: str = path
+        self.watermark: float = 0
+        self.full_sync: float = 0
+        self.resources: list = []
+        self.lang: str = ''
+        self.variations: list = []
+
+    def load(self) -> bool:
+        """ Read the snapshot file, return False if no valid one exists """
+        if not os.path.exists(self.path):
+            return False
+
+        try:
+            with open(self.path, mode='r', encoding='utf-8') as snap_file:
+                content = json.load(snap_file)
+            self.watermark = content['watermark']
+            self.full_sync = content['full_sync']
+            self.resources = content['resources']
+            self.lang = content['lang']
+            self.variations = content['variations']
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.warning(f"Invalid variation snapshot {self.path}, "
+                           "ignore it.")
+            self.variations = []
+            return False
+        return True
+
+    def expired(self, interval: int, resources: list, lang: str) -> bool:
+        """
+        Check if a full download of the variations is required.
+
+        Parameter:
+            interval    [int]   -   minutes between two full downloads
+            resources   [list]  -   required variation sub-resources
+            lang        [str]   -   required language of the texts
+
+        Return:
+                        [bool]
+        """
+        if not self.watermark or not self.full_sync:
+            return True
+        if any(resource not in self.resources for resource in resources):
+            return True
+        if lang != self.lang:
+            return True
+        age = time.time() - self.full_sync
+        return age < 0 or age > interval * 60
+
+    def replace(self, variations: list, timestamp: float, resources: list,
+                lang: str) -> None:
+        """ Replace the snapshot with a full download """
+        self.variations = variations
+        self.resources = resources
+        self.lang = lang
+        self.watermark = timestamp
+        self.full_sync = timestamp
+
+    def merge(self, variations: list, timestamp: float) -> None:
+        """ Replace changed variations and append new ones """
+        position = {var['id']: index
+                    for index, var in enumerate(self.variations)}
+        for var in variations:
+            if var['id'] in position:
+                self.variations[position[var['id']]] = var
+            else:
+                position[var['id']] = len(self.variations)
+                self.variations.append(var)
+        self.watermark = timestamp
+
+    def save(self) -> None:
+        """ Write the snapshot together with the high-water mark """
+        temp_path = self.path + '.tmp'
+        content = {'watermark': self.watermark, 'full_sync': self.full_sync,
+                   'resources': self.resources, 'lang': self.lang,
+                   'variations': self.variations}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(temp_path, mode='w', encoding='utf-8') as snap_file:
+                json.dump(content, snap_file, separators=(',', ':'))
+            os.replace(temp_path, self.path)
+        except (OSError, TypeError, ValueError):
+            logger.warning(f"Unable to write the variation snapshot "
+                           f"{self.path}.")
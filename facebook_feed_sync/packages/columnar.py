@@ -0,0 +1,129 @@
+"""
+Synchronize a google sheet with data from PlentyMarkets.
+The google sheet is used as a data feed for a facebook product catalog.
+
+Copyright (C) 2020  Sebastian Fricke, Panasiam
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Whole-column computations for the stock and price columns.
+
+The entries of the configured warehouse or sales price are collected from
+the sub-lists of all variations into a NumPy array once, which is clamped
+or converted into integer cents as array operations.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+
+
+def select_sub_resource_values(variations: list, resource: str,
+                               target: int) -> np.ndarray:
+    """
+    Pick the value of the sub-resource entry with the target ID for every
+    variation, later entries replace earlier ones with the same ID.
+
+    Parameter:
+        variations  [list]      -   VariationRecord instances
+        resource    [str]       -   name of a record sub-resource with
+                                    (ID, value) pairs
+        target      [int]       -   ID of the required entry
+
+    Return:
+                    [ndarray]   -   value for every variation, 0 for
+                                    variations without a matching entry
+    """
+    matches = [(position, value)
+               for position, variation in enumerate(variations)
+               for key, value in getattr(variation, resource)
+               if key == target]
+    if not matches:
+        return np.zeros(len(variations), dtype=np.int64)
+
+    positions, values = zip(*matches)
+    values = np.array(values)
+    column = np.zeros(len(variations), dtype=values.dtype)
+    # Assignments to the same position keep the last value
+    column[np.array(positions)] = values
+    return column
+
+
+def clamp_inventory(stock: np.ndarray) -> list:
+    """ Turn the stock into the inventory column, negative stock is 0 """
+    return np.where(stock < 0, 0, stock).astype(str).tolist()
+
+
+def availability_messages(stock: np.ndarray) -> list:
+    """ Turn the stock into the availability column """
+    return np.where(stock > 0, 'in stock', 'out of stock').tolist()
+
+
+def to_cents(prices) -> np.ndarray:
+    """
+    Convert prices into integer cents, rounded half up to the nearest cent.
+
+    Floats are rounded to 6 decimals first, so that the representation
+    error of values like 25.7 (25.699999...) doesn't cost a cent.
+    Decimal values are converted exactly.
+
+    Parameter:
+        prices      [ndarray/list] - prices in the currency unit
+
+    Return:
+                    [ndarray]   -   prices in cents (int64)
+    """
+    values = np.asarray(prices)
+    if values.dtype == object:
+        return np.array(
+            [int((Decimal(str(price)) * 100).to_integral_value(
+                rounding=ROUND_HALF_UP)) for price in values.tolist()],
+            dtype=np.int64)
+    if np.issubdtype(values.dtype, np.integer):
+        return values.astype(np.int64) * 100
+    scaled = np.round(values.astype(np.float64) * 100, 6)
+    return (np.sign(scaled) * np.floor(np.abs(scaled) + 0.5)).astype(
+        np.int64)
+
+
+def format_prices(cents: np.ndarray, currency: str = 'EUR',
+                  decimal_separator: str = ',',
+                  thousands_separator: str = '') -> list:
+    """
+    Turn integer cents into the accepted price format:
+    [{UNITS}{DECIMAL SEPARATOR}{CENT} {CURRENCY}], e.g. '1234,50 EUR'.
+
+    Parameter:
+        cents       [ndarray]   -   prices in cents
+        currency    [str]       -   ISO 4217 code appended to the price
+        decimal_separator [str] -   separator between units and cents
+        thousands_separator [str] - separator between groups of three
+                                    digits, empty for no grouping
+
+    Return:
+                    [list]      -   formatted price for every value
+    """
+    cents = np.asarray(cents, dtype=np.int64)
+    units, fraction = np.divmod(np.abs(cents), 100)
+    suffix = f' {currency}' if currency else ''
+    if thousands_separator:
+        units = [f'{unit:,}'.replace(',', thousands_separator)
+                 for unit in units.tolist()]
+    else:
+        units = units.tolist()
+    prices = [f"{unit}{decimal_separator}{part:02}{suffix}"
+              for unit, part in zip(units, fraction.tolist())]
+    for position in np.flatnonzero(cents < 0).tolist():
+        prices[position] = '-' + prices[position]
+    return prices
@@ -0,0 +1,356 @@
+"""
+Synchronize a google sheet with data from PlentyMarkets.
+The google sheet is used as a data feed for a facebook product catalog.
+
+Copyright (C) 2020  Sebastian Fricke, Panasiam
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Requests to the PlentyMarkets REST API, which are not covered by the
+plenty_api package (e.g. filters for the update date of variations or
+single attributes), and the downloads of variations and items, whose
+response headers report the call limits to the request scheduler.
+The requests use the URL and the bearer token of the plenty_api instance
+and the request scheduler of a ScheduledPlentyApi instance.
+
+Independent requests can be run concurrently within a bounded thread pool.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from loguru import logger
+
+from facebook_feed_sync.packages.cache import VariationSnapshot
+from facebook_feed_sync.packages.scheduler import (
+    RequestScheduler, THROTTLE_WAIT
+)
+
+
+VARIATION_ROUTE = '/rest/items/variations'
+ITEM_ROUTE = '/rest/items'
+ATTRIBUTE_ROUTE = '/rest/items/attributes'
+REQUEST_TIMEOUT = 60
+# Seconds subtracted from the high-water mark to tolerate clock deviations
+WATERMARK_OVERLAP = 300
+# Filters for changes of the variation itself and of its related data
+UPDATE_FILTERS = ['updatedBetween', 'relatedUpdatedBetween']
+
+
+def build_query(refine: dict = None, additional: list = None,
+                lang: str = '') -> dict:
+    """ Create the query parameters in the same way as plenty_api """
+    query: dict = dict(refine) if refine else {}
+    if additional:
+        query['with'] = ','.join(additional)
+    if lang:
+        query['lang'] = lang.lower()
+    return query
+
+
+def request_json(api, route: str, params: dict) -> dict:
+    """
+    Send a GET request through the scheduler and decode the JSON body.
+
+    Throttled requests (HTTP 429) are repeated after a pause.
+
+    Parameter:
+        api         [PlentyApi] -   instance with the URL and the token
+        route       [str]       -   route of the REST API
+        params      [dict]      -   query parameters
+
+    Return:
+                    [dict/list/None] - response body, None on failure
+    """
+    scheduler = getattr(api, 'scheduler', None)
+    if not isinstance(scheduler, RequestScheduler):
+        scheduler = None
+    while True:
+        if scheduler:
+            scheduler.acquire()
+        headers = None
+        try:
+            response = requests.get(api.url + route, headers=api.creds,
+                                    params=params, timeout=REQUEST_TIMEOUT)
+            headers = response.headers
+        except requests.RequestException as err:
+            logger.error(f"ERROR: GET {route} request failed: {err}")
+            return None
+        finally:
+            if scheduler:
+                scheduler.release(headers=headers)
+        if response.status_code != 429:
+            break
+        logger.warning("Request throttled by PlentyMarkets, retry after a "
+                       "pause.")
+        if scheduler:
+            scheduler.throttle(headers=headers)
+        else:
+            time.sleep(THROTTLE_WAIT)
+
+    try:
+        return response.json()
+    except ValueError:
+        logger.error(f"ERROR: invalid response for GET {route} "
+                     f"[{response.status_code}]")
+        return None
+
+
+def request_page(api, route: str, query: dict, page: int) -> dict:
+    """
+    Get a single page of a paginated GET route.
+
+    Parameter:
+        api         [PlentyApi] -   instance with the URL and the token
+        route       [str]       -   route of the REST API
+        query       [dict]      -   query parameters
+        page        [int]       -   number of the page (starting at 1)
+
+    Return:
+                    [dict]      -   response body, empty on failure
+    """
+    params = dict(query)
+    params['page'] = page
+    body = request_json(api=api, route=route, params=params)
+    if body is None:
+        return {}
+
+    if not isinstance(body, dict) or 'entries' not in body:
+        logger.error(f"ERROR: GET {route} request failed:\n{body}")
+        return {}
+    return body
+
+
+def request_all_pages(api, route: str, query: dict,
+                      workers: int = 1) -> list:
+    """
+    Collect the entries of all pages of a paginated GET route.
+
+    With more than one worker, the amount of pages is taken from the
+    first page and the remaining pages are requested concurrently.
+
+    Parameter:
+        api         [PlentyApi] -   instance with the URL and the token
+        route       [str]       -   route of the REST API
+        query       [dict]      -   query parameters
+        workers     [int]       -   maximum amount of concurrent requests
+
+    Return:
+                    [list/None] -   entries in page order, None if any
+                                    request failed
+    """
+    body = request_page(api=api, route=route, query=query, page=1)
+    if not body:
+        return None
+    entries: list = list(body['entries'])
+    if body['isLastPage']:
+        return entries
+
+    if workers > 1 and body.get('lastPageNumber'):
+        last_page = body['lastPageNumber']
+        with ThreadPoolExecutor(
+                max_workers=min(workers, last_page - 1)) as pool:
+            bodies = list(pool.map(
+                lambda page: request_page(api=api, route=route, query=query,
+                                          page=page),
+                range(2, last_page + 1)))
+        for page_body in bodies:
+            if not page_body:
+                return None
+            entries += page_body['entries']
+        return entries
+
+    page = 1
+    while not body['isLastPage']:
+        page += 1
+        body = request_page(api=api, route=route, query=query, page=page)
+        if not body:
+            return None
+        entries += body['entries']
+    return entries
+
+
+def get_variations(api, refine: dict = None, additional: list = None,
+                   lang: str = '', workers: int = 1) -> list:
+    """
+    Get all variations matching the filters.
+
+    A single worker requests one page after another, more workers request
+    the pages concurrently.
+
+    Parameter:
+        api         [PlentyApi] -   instance with the URL and the token
+        refine      [dict]      -   filters for the request
+        additional  [list]      -   variation sub-resources to include
+        lang        [str]       -   language of the texts
+        workers     [int]       -   maximum amount of concurrent requests
+
+    Return:
+                    [list/None] -   variations
+    """
+    query = build_query(refine=refine, additional=additional, lang=lang)
+    return request_all_pages(api=api, route=VARIATION_ROUTE, query=query,
+                             workers=workers)
+
+
+def get_items(api, refine: dict = None, additional: list = None,
+              lang: str = '') -> list:
+    """
+    Get all items matching the filters.
+
+    Parameter:
+        api         [PlentyApi] -   instance with the URL and the token
+        refine      [dict]      -   filters for the request
+        additional  [list]      -   item sub-resources to include
+        lang        [str]       -   language of the texts
+
+    Return:
+                    [list/None] -   items, None if any request failed
+    """
+    query = build_query(refine=refine, additional=additional, lang=lang)
+    return request_all_pages(api=api, route=ITEM_ROUTE, query=query)
+
+
+def get_variations_since(api, since: float, refine: dict = None,
+                         additional: list = None, lang: str = '',
+                         workers: int = 1) -> list:
+    """
+    Get all variations, which or whose related data changed since @since.
+
+    Parameter:
+        api         [PlentyApi] -   instance with the URL and the token
+        since       [float]     -   UNIX timestamp of the last fetch
+        refine      [dict]      -   filters for the request
+        additional  [list]      -   variation sub-resources to include
+        lang        [str]       -   language of the texts
+        workers     [int]       -   maximum amount of concurrent requests
+
+    Return:
+                    [list/None] -   changed variations, None on failure
+    """
+    query = build_query(refine=refine, additional=additional, lang=lang)
+    changed: dict = {}
+    for update_filter in UPDATE_FILTERS:
+        query_filter = dict(query)
+        query_filter[update_filter] = int(since)
+        entries = request_all_pages(api=api, route=VARIATION_ROUTE,
+                                    query=query_filter, workers=workers)
+        if entries is None:
+            return None
+        changed.update({var['id']: var for var in entries})
+    return list(changed.values())
+
+
+def get_variations_incremental(api, snapshot: VariationSnapshot,
+                               interval: int, refine: dict = None,
+                               additional: list = None, lang: str = '',
+                               refresh: bool = False,
+                               workers: int = 1) -> list:
+    """
+    Update the variation snapshot with the variations that changed since
+    the high-water mark and perform a full download once @interval
+    expired, to detect deleted and deactivated variations.
+
+    Parameter:
+        api         [PlentyApi] -   instance with the URL and the token
+        snapshot    [VariationSnapshot] - local copy of the variations
+        interval    [int]       -   minutes between two full downloads
+        refine      [dict]      -   filters for the request
+        additional  [list]      -   variation sub-resources to include
+        lang        [str]       -   language of the texts
+        refresh     [bool]      -   force a full download
+        workers     [int]       -   maximum amount of concurrent requests
+
+    Return:
+                    [list]      -   all variations, empty list on failure
+    """
+    additional = list(additional) if additional else []
+    start = time.time()
+    snapshot.load()
+    if refresh or snapshot.expired(interval=interval, resources=additional,
+                                   lang=lang):
+        variations = get_variations(api=api, refine=refine,
+                                    additional=additional, lang=lang,
+                                    workers=workers)
+        if not variations:
+            return []
+        snapshot.replace(variations=variations, timestamp=start,
+                         resources=additional, lang=lang)
+        return snapshot.variations
+
+    changed = get_variations_since(
+        api=api, since=snapshot.watermark - WATERMARK_OVERLAP, refine=refine,
+        additional=snapshot.resources, lang=lang, workers=workers)
+    if changed is None:
+        return []
+    snapshot.merge(variations=changed, timestamp=start)
+    return snapshot.variations
+
+
+def get_attributes(api, attribute_ids: list) -> list:
+    """
+    Get the attributes with the given IDs together with their values.
+
+    plenty_api only provides the list of all attributes, which includes
+    every attribute of the shop with all values and translations.
+
+    Parameter:
+        api         [PlentyApi] -   instance with the URL and the token
+        attribute_ids [list]    -   IDs of the required attributes
+
+    Return:
+                    [list/None] -   attributes, None if any request failed
+    """
+    attributes: list = []
+    for attribute_id in attribute_ids:
+        route = f'{ATTRIBUTE_ROUTE}/{attribute_id}'
+        body = request_json(api=api, route=route, params={'with': 'values'})
+        if not isinstance(body, dict) or 'id' not in body:
+            logger.error(f"ERROR: GET {route} request failed:\n{body}")
+            return None
+        attributes.append(body)
+    return attributes
+
+
+def run_task(name: str, task):
+    """ Run a request and report a failure for the named entity """
+    try:
+        return task()
+    except Exception as err:  # pylint: disable=broad-except
+        logger.error(f"ERROR: {name} request failed: {err}")
+        return None
+
+
+def run_parallel(tasks: dict, workers: int = 1) -> dict:
+    """
+    Run independent requests, within a thread pool of at most @workers
+    threads or one after another if @workers is 1.
+
+    Parameter:
+        tasks       [dict]      -   callable request for each entity
+        workers     [int]       -   maximum amount of concurrent requests
+
+    Return:
+                    [dict]      -   response for each entity, None for
+                                    requests that raised an exception
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        return {name: run_task(name=name, task=task)
+                for name, task in tasks.items()}
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        futures = {name: pool.submit(run_task, name, task)
+                   for name, task in tasks.items()}
+        return {name: future.result() for name, future in futures.items()}
@@ -17,9 +17,9 @@ GNU Affero General Public License for more details.
 You should have received a copy of the GNU Affero General Public License
 along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-import copy
 import gspread
 import gspread_dataframe
+from gspread.utils import rowcol_to_a1
 import pandas
 import numpy as np
 from loguru import logger
@@ -34,6 +34,9 @@ GSHEET_HEADER = [
     'item_group_id', 'gender', 'color', 'size', 'age_group', 'material',
     'pattern', 'product_type', 'shipping', 'shipping_weight'
 ]
+# Share of changed cells, above which the whole sheet is written instead
+# of the changed ranges
+DIFF_WRITE_LIMIT = 0.3
 
 
 def valid_dataframe(parameter: pandas.DataFrame) -> int:
@@ -46,34 +49,337 @@ def valid_dataframe(parameter: pandas.DataFrame) -> int:
     return 1
 
 
-def gsheet_read(worksheet: gspread.Worksheet) -> pandas.DataFrame:
+def gsheet_read(worksheet: gspread.Worksheet,
+                columns: list = None) -> pandas.DataFrame:
     """
     Read the specified worksheet directly into a DataFrame
     and remove rows, where no ID is given.
+
+    With @columns only the id column and these columns are read, if the
+    header of the sheet matches GSHEET_HEADER, the complete header is kept
+    within the attrs of the DataFrame ('sheet_header').
+
+    Parameter:
+        worksheet [Worksheet]   -   google sheet
+        columns [list]          -   required columns, all if empty
+
+    Return:
+        [DataFrame]             -   google sheet
     """
 
     if not worksheet:
         return pandas.DataFrame()
-    dataframe = pandas.DataFrame(worksheet.get_all_records(), dtype=str)
+    dataframe = None
+    if columns:
+        dataframe = read_columns(worksheet=worksheet, columns=columns)
+    if dataframe is None:
+        dataframe = parse_sheet_values(values=worksheet.get_all_values())
     if len(dataframe.index) == 0:
         return pandas.DataFrame(columns=GSHEET_HEADER)
 
     # Remove rows where the ID is missing
     empty_rows = dataframe[dataframe['id'] == '']
     if len(empty_rows.index) > 0:
-        for row in empty_rows.index:
-            worksheet.delete_rows(start_index=row+2)
-            dataframe.drop(index=row, inplace=True)
+        # The header occupies the first row of the sheet
+        delete_sheet_rows(worksheet=worksheet,
+                          rows=(empty_rows.index + 1).tolist())
+        dataframe.drop(index=empty_rows.index, inplace=True)
         dataframe.reset_index(drop=True, inplace=True)
 
     return dataframe
 
 
+def parse_sheet_values(values: list) -> pandas.DataFrame:
+    """
+    Build the DataFrame from the cell values of the whole sheet.
+
+    The rows are converted into a single 2D array, whose columns back
+    the DataFrame, which avoids a record per row and a conversion of the
+    cell values, which are kept as text. A header with duplicate names
+    raises a GSpreadException, like get_all_records.
+
+    Parameter:
+        values [list]           -   rows of the sheet including the header
+
+    Return:
+        [DataFrame]             -   google sheet
+    """
+    if not values:
+        return pandas.DataFrame()
+    header, rows = values[0], values[1:]
+    if header != GSHEET_HEADER:
+        logger.warning("The header of the google sheet doesn't match the "
+                       f"expected header: {header}")
+    width = len(header)
+    if len(set(header)) != width:
+        raise gspread.exceptions.GSpreadException(
+            f"The header of the google sheet contains duplicates: {header}")
+    if any(len(row) != width for row in rows):
+        rows = [(row + [''] * width)[:width] for row in rows]
+    if not rows:
+        return pandas.DataFrame(columns=header, dtype=str)
+    return pandas.DataFrame(np.array(rows, dtype=object), columns=header)
+
+
+def read_columns(worksheet: gspread.Worksheet,
+                 columns: list) -> pandas.DataFrame:
+    """
+    Read the header and the id column together with the given columns
+    within a single batch request.
+
+    Parameter:
+        worksheet [Worksheet]   -   google sheet
+        columns [list]          -   required columns
+
+    Return:
+        [DataFrame/None]        -   columns of the google sheet, None if
+                                    the header doesn't match GSHEET_HEADER
+    """
+    names = ['id'] + [column for column in GSHEET_HEADER
+                      if column in columns and column != 'id']
+    letters = [rowcol_to_a1(1, GSHEET_HEADER.index(name) + 1)[:-1]
+               for name in names]
+    ranges = ['1:1'] + [f'{letter}2:{letter}' for letter in letters]
+    responses = worksheet.batch_get(ranges, major_dimension='COLUMNS')
+    header = [column[0] if column else '' for column in responses[0]]
+    if header != GSHEET_HEADER:
+        logger.warning("The header of the google sheet doesn't match the "
+                       "expected header, read all columns.")
+        return None
+
+    # Empty cells at the end of a column are left out of the response
+    values = [response[0] if response else [] for response in responses[1:]]
+    length = max(len(column) for column in values)
+    dataframe = pandas.DataFrame(
+        {name: column + [''] * (length - len(column))
+         for name, column in zip(names, values)}, dtype=str)
+    dataframe.attrs['sheet_header'] = list(GSHEET_HEADER)
+    return dataframe
+
+
+def get_row_ranges(rows: list) -> list:
+    """
+    Merge row indexes into contiguous ranges.
+
+    Parameter:
+        rows [list]             -   zero-based row indexes
+
+    Return:
+        [list]                  -   (start, end) tuples with an exclusive
+                                    end, ordered from the bottom up
+    """
+    ranges: list = []
+    for row in sorted(set(rows)):
+        if ranges and ranges[-1][1] == row:
+            ranges[-1][1] = row + 1
+        else:
+            ranges.append([row, row + 1])
+    return [(start, end) for start, end in reversed(ranges)]
+
+
+def delete_sheet_rows(worksheet: gspread.Worksheet, rows: list) -> None:
+    """
+    Delete the rows of the worksheet within a single batch request.
+
+    The contiguous ranges are deleted from the bottom up, so that the
+    deletion of a range doesn't shift the rows of the following ranges.
+
+    Parameter:
+        worksheet [Worksheet]   -   google sheet
+        rows [list]             -   zero-based row indexes of the sheet
+    """
+    requests = [
+        {'deleteDimension': {'range': {
+            'sheetId': worksheet.id, 'dimension': 'ROWS',
+            'startIndex': start, 'endIndex': end}}}
+        for start, end in get_row_ranges(rows=rows)
+    ]
+    if requests:
+        worksheet.spreadsheet.batch_update({'requests': requests})
+
+
 def gsheet_write(worksheet: gspread.Worksheet,
-                 dataframe: pandas.DataFrame) -> None:
-    """ Update the hosted google sheet with the local dataframe """
+                 dataframe: pandas.DataFrame,
+                 original: pandas.DataFrame = None,
+                 columns: list = None) -> None:
+    """
+    Update the hosted google sheet with the local dataframe.
+
+    With the @original dataframe read from the sheet, only a part of the
+    sheet is sent within a single batch request:
+        - with @columns: the synchronized columns and the added rows,
+          after deleting the removed rows from the sheet
+        - without @columns: the changed cells, unless the header changed
+          or more than DIFF_WRITE_LIMIT of the cells changed
+
+    Parameter:
+        worksheet [Worksheet]   -   google sheet
+        dataframe [DataFrame]   -   updated google sheet
+        original [DataFrame]    -   google sheet as read from the sheet
+        columns [list]          -   synchronized columns
+    """
+    if original is None:
+        gspread_dataframe.set_with_dataframe(worksheet, dataframe)
+        return
+
+    if columns:
+        write_columns(worksheet=worksheet, dataframe=dataframe,
+                      original=original, columns=columns)
+        return
+
+    if list(original.columns) != list(dataframe.columns):
+        gspread_dataframe.set_with_dataframe(worksheet, dataframe)
+        return
+
+    values = get_cell_values(dataframe=dataframe)
+    changed = get_changed_cells(original=get_cell_values(dataframe=original),
+                                updated=values)
+    if changed.sum() > DIFF_WRITE_LIMIT * changed.size:
+        logger.info("Too many changed cells, write the whole sheet.")
+        gspread_dataframe.set_with_dataframe(worksheet, dataframe)
+        return
+
+    data = [get_range_data(values=values, cell_range=cell_range)
+            for cell_range in get_changed_ranges(changed=changed)]
+    if data:
+        worksheet.batch_update(data, value_input_option='USER_ENTERED')
+
+
+def write_columns(worksheet: gspread.Worksheet, dataframe: pandas.DataFrame,
+                  original: pandas.DataFrame, columns: list) -> None:
+    """
+    Write the synchronized columns of the remaining rows and the added
+    rows, after deleting the removed rows from the sheet.
+
+    The remaining rows have to keep their order in front of the added
+    rows (as left by delete_removed_items and add_new_items), otherwise
+    the whole sheet is written. The columns are located within the header
+    of the sheet, which is also complete, if only a part of the columns
+    was read (see gsheet_read).
+
+    Parameter:
+        worksheet [Worksheet]   -   google sheet
+        dataframe [DataFrame]   -   updated google sheet
+        original [DataFrame]    -   google sheet as read from the sheet
+        columns [list]          -   synchronized columns
+    """
+    # Only a part of the columns was read
+    partial = 'sheet_header' in original.attrs
+    sheet_header = original.attrs.get('sheet_header', list(original.columns))
+    kept = original['id'].isin(dataframe['id']).to_numpy()
+    kept_ids = original['id'][kept].tolist()
+    count = len(kept_ids)
+    if (dataframe['id'].iloc[:count].tolist() != kept_ids or
+            any(column not in sheet_header for column in columns)):
+        if partial:
+            logger.error("ERROR: unable to write the google sheet, the "
+                         "rows or columns don't match the sheet.")
+            return
+        logger.info("Rows were moved, write the whole sheet.")
+        gspread_dataframe.set_with_dataframe(worksheet, dataframe)
+        return
+
+    removed = np.flatnonzero(~kept)
+    if len(removed) > 0:
+        # The header occupies the first row of the sheet
+        delete_sheet_rows(worksheet=worksheet, rows=(removed + 1).tolist())
+
+    # Columns, which weren't read, are empty for the remaining rows
+    values = get_cell_values(
+        dataframe=dataframe.reindex(columns=sheet_header))
+    selected = np.zeros((1, len(sheet_header)), dtype=bool)
+    for column in columns:
+        selected[0, sheet_header.index(column)] = True
+    data = []
+    if count > 0:
+        data += [get_range_data(values=values,
+                                cell_range=(0, count - 1, first, last))
+                 for _, _, first, last in get_changed_ranges(
+                     changed=selected)]
+    if len(values) > count:
+        data.append(get_range_data(
+            values=values, cell_range=(count, len(values) - 1, 0,
+                                       len(sheet_header) - 1)))
+    if data:
+        worksheet.batch_update(data, value_input_option='USER_ENTERED')
+
+
+def get_range_data(values: np.ndarray, cell_range: tuple) -> dict:
+    """
+    Create the A1 range and the values of a rectangle of data cells.
+
+    Parameter:
+        values [ndarray]        -   cell values of the data rows
+        cell_range [tuple]      -   (first row, last row, first column,
+                                    last column), zero-based
+
+    Return:
+        [dict]                  -   entry of a worksheet.batch_update call
+    """
+    first_row, last_row, first_col, last_col = cell_range
+    # The sheet starts at A1 with the header
+    start = rowcol_to_a1(first_row + 2, first_col + 1)
+    end = rowcol_to_a1(last_row + 2, last_col + 1)
+    return {'range': f'{start}:{end}',
+            'values': values[first_row:last_row + 1,
+                             first_col:last_col + 1].tolist()}
+
 
-    gspread_dataframe.set_with_dataframe(worksheet, dataframe)
+def get_cell_values(dataframe: pandas.DataFrame) -> np.ndarray:
+    """ Convert the dataframe into the text of the cells, NaN is empty """
+    return dataframe.fillna('').astype(str).to_numpy(dtype=object)
+
+
+def get_changed_cells(original: np.ndarray,
+                      updated: np.ndarray) -> np.ndarray:
+    """
+    Compare the cells of the sheet with the updated cells, every cell of a
+    row, which doesn't exist within the sheet, counts as changed.
+
+    Parameter:
+        original [ndarray]      -   cell values read from the sheet
+        updated [ndarray]       -   updated cell values
+
+    Return:
+        [ndarray]               -   boolean mask in the shape of @updated
+    """
+    changed = np.ones(updated.shape, dtype=bool)
+    rows = min(len(original), len(updated))
+    changed[:rows] = original[:rows] != updated[:rows]
+    return changed
+
+
+def get_changed_ranges(changed: np.ndarray) -> list:
+    """
+    Group the changed cells into rectangles: consecutive changed cells of
+    a row form a segment, which is extended over the following rows with
+    a segment over the same columns.
+
+    Parameter:
+        changed [ndarray]       -   boolean mask of the changed cells
+
+    Return:
+        [list]                  -   (first row, last row, first column,
+                                    last column) tuples, zero-based
+    """
+    rectangles: list = []
+    open_segments: dict = {}
+    for row in np.flatnonzero(changed.any(axis=1)).tolist():
+        columns = np.flatnonzero(changed[row])
+        breaks = np.flatnonzero(np.diff(columns) > 1)
+        starts = columns[np.concatenate(([0], breaks + 1))].tolist()
+        ends = columns[np.concatenate((breaks, [len(columns) - 1]))].tolist()
+        segments: dict = {}
+        for segment in zip(starts, ends):
+            index = open_segments.get(segment)
+            if index is not None and rectangles[index][1] == row - 1:
+                rectangles[index][1] = row
+            else:
+                index = len(rectangles)
+                rectangles.append([row, row, segment[0], segment[1]])
+            segments[segment] = index
+        open_segments = segments
+    return [tuple(rectangle) for rectangle in rectangles]
 
 
 def delete_removed_items(google: pandas.DataFrame,
@@ -133,17 +439,13 @@ def add_new_items(google: pandas.DataFrame,
     if len(google.index) == 0 and len(google.columns) == 0:
         return pandas.DataFrame()
 
-    plenty_copy = copy.deepcopy(plenty)
     # ITEMS found in plenty but not in gsheet
-    plenty_copy['create'] = np.where(~plenty_copy['id'].isin(google['id']),
-                                     1, 0)
-
-    new_items = plenty_copy[plenty_copy['create'] == 1]
-    if len(new_items.index) == 0:
+    new_ids = plenty['id'][~plenty['id'].isin(google['id'])]
+    if len(new_ids.index) == 0:
         return google
 
     new_items = plenty_data.get_data_from_plentymarkets(
-        target=new_items['id'].values)
+        target=new_ids.values)
 
     return pandas.concat([google, new_items], ignore_index=True)
 
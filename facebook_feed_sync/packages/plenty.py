@@ -17,12 +17,19 @@
     You should have received a copy of the GNU Affero General Public License
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
-import copy
+import numpy as np
 import pandas
 from loguru import logger
 
 import facebook_feed_sync.packages.shared_data as shared
 import facebook_feed_sync.packages.gsheet as gsheet
+import facebook_feed_sync.packages.columnar as columnar
+from facebook_feed_sync.packages.cache import (
+    cached_request, cached_request_by_id
+)
+import facebook_feed_sync.packages.fetch as fetch
+from facebook_feed_sync.packages.fetch import run_parallel
+from facebook_feed_sync.packages.records import VariationRecord, to_records
 
 
 ITEM_TYPE_COLUMNS = ['title', 'description', 'google_product_category',
@@ -32,15 +39,151 @@ VALID_ATTRIBUTE_TYPES = ['color', 'size']
 VALID_VARIATION_PROPERTIES = ['url', 'material']
 VALID_ITEM_PROPERTIES = ['gender', 'age', 'google_category']
 VALID_TEXT_TYPES = ['name1', 'name2', 'name3', 'description']
+# Maximum amount of item IDs within a single get items request
+ITEM_ID_BATCH_SIZE = 50
+# Variation sub-resources (API 'with' values) read by each column
+VARIATION_RESOURCE_MAP = {
+    'availability':     ['stock'],
+    'inventory':        ['stock'],
+    'price':            ['variationSalesPrices'],
+    'link':             ['properties'],
+    'material':         ['properties'],
+    'image_link':       ['images'],
+    'color':            ['variationAttributeValues'],
+    'size':             ['variationAttributeValues']
+}
+
+
+class MatchTables():
+    """
+    Indexes of the items, manufacturers and attributes fetched within a
+    single run, shared by every ColumnValuesFiller of the run.
+
+    An index is None as long as the entity wasn't fetched successfully,
+    the attribute index only contains the configured attributes.
+    Entities fetched again without the cache within the run are listed in
+    @refreshed, so that a stale cached response is replaced at most once.
+
+    The texts and properties of the items are indexed by language:
+        texts               [dict]  -   (item ID, lang) -> text
+        item_properties     [dict]  -   (item ID, property ID) ->
+                                        (selection ID, {lang: value})
+        property_selections [dict]  -   (property ID, selection ID, lang)
+                                        -> name of the selection value
+    """
+    def __init__(self):
+        self.items: dict = None
+        self.manufacturers: dict = None
+        self.attributes: dict = None
+        self.texts: dict = {}
+        self.item_properties: dict = {}
+        self.property_selections: dict = {}
+        self.refreshed: set = set()
+
+    def contains(self, entity: str, keys: list = None) -> bool:
+        """
+        Check if the entity was fetched and, if given, if its index
+        contains all of the @keys.
+        """
+        index = getattr(self, entity, None)
+        if index is None:
+            return False
+        return keys is None or all(key in index for key in keys)
+
+    def add_attributes(self, attributes: dict) -> None:
+        """ Extend the attribute index with newly fetched attributes """
+        if self.attributes is None:
+            self.attributes = {}
+        self.attributes.update(attributes)
+
+    def set_items(self, items: list) -> None:
+        """
+        Index the items together with their texts and properties.
+
+        Parameter:
+            items       [list]  -   items from the API response
+        """
+        self.items = {item['id']: item for item in items}
+        for item in items:
+            for text in item.get('texts') or []:
+                self.texts[(item['id'], text['lang'].lower())] = text
+            for prop in item.get('itemProperties') or []:
+                for select in prop.get('propertySelection') or []:
+                    self.property_selections[
+                        (prop['propertyId'], select['id'],
+                         select['lang'].lower())] = select['name']
+                selection_id = prop.get('propertySelectionId')
+                texts = {text['lang'].lower(): text['value']
+                         for text in prop.get('valueTexts') or []}
+                if selection_id or texts:
+                    self.item_properties[(item['id'], prop['propertyId'])] =\
+                        (selection_id, texts)
+
+
+class ColumnValueError(Exception):
+    """ A column cannot be filled for one of the variations """
+
+
+class ColumnSpec():
+    """
+    Declaration of a facebook catalog column.
+
+    The builder receives the declared intermediates as keyword arguments
+    and returns either a cell function, which creates the value for a
+    single variation and its parent item, a constant value for every
+    variation or, for whole columns, the values of all variations.
+    """
+    __slots__ = ('build', 'requires', 'whole', 'item')
+
+    def __init__(self, build, requires: tuple = (), whole: bool = False,
+                 item: bool = False):
+        """
+        Parameter:
+            build       [callable]  -   ColumnValuesFiller method
+            requires    [tuple]     -   names of the intermediates
+            whole       [bool]      -   builds the values of all variations
+            item        [bool]      -   value depends only on the parent item
+        """
+        self.build = build
+        self.requires: tuple = tuple(requires)
+        self.whole: bool = whole
+        self.item: bool = item
+
+
+# Facebook catalog column name -> ColumnSpec
+COLUMN_REGISTRY: dict = {}
+# Name of the intermediate -> ColumnValuesFiller method computing it
+INTERMEDIATE_REGISTRY: dict = {}
+
+
+def register_column(name: str, requires: tuple = (), whole: bool = False,
+                    item: bool = False):
+    """ Declare the decorated method as builder of the column @name """
+    def register(method):
+        COLUMN_REGISTRY[name] = ColumnSpec(build=method, requires=requires,
+                                           whole=whole, item=item)
+        return method
+    return register
+
+
+def register_intermediate(name: str):
+    """ Declare the decorated method as source of the intermediate @name """
+    def register(method):
+        INTERMEDIATE_REGISTRY[name] = method
+        return method
+    return register
 
 
 class ColumnValuesFiller():
     """
     Fetch the correct values from PlentyMarkets for a facebook catalog column.
 
-    Map every column of the facebook catalog to a method of this class.
-    The method returns the corresponding values for all variations, which
-    were declared within the class initialization.
+    Every column of the facebook catalog is declared in the column
+    registry together with the intermediate data it reads (stock, texts,
+    attribute map, ...). get_columns fills all requested columns for the
+    variations, which were declared within the class initialization, in a
+    single pass. Each intermediate is computed at most once per instance
+    and only if a requested column reads it.
 
     Build match-tables to simplify access to item, attribute and brand related
     information, while reducing the API calls at the same time.
@@ -50,154 +193,490 @@ class ColumnValuesFiller():
         Create the match-tables with the given columns and variations.
 
         Parameter:
-            variations  [list]  -   list of variation IDs
-                                    (variation number in PlentyMarkets)
+            variations  [list]  -   variations from the API response or
+                                    VariationRecord instances
             header      [list]  -   list of facebook catalog column names
         """
-        self.variations: list = variations
+        self.variations: list = to_records(variations=variations)
         self.header: list = header
         self.plenty = shared.plenty_api_instance
-        self.inventory: list = []
-        self.match_item: dict = {}
-        self.match_brand: dict = {}
-        self.match_attribute: dict = {}
+        self.variation_index: dict = {}
+        self.intermediates: dict = {}
+        self.tables: MatchTables = None
         self.matchtables = self.build_matchtables()
 
-    def get_value(self, name: str) -> list:
-        default = 'invalid column'
-        return getattr(self, str(name) + '_value', lambda: default)()
-
-    def id_value(self) -> list:
-        return [x['number'] for x in self.variations]
+    @property
+    def match_item(self) -> dict:
+        return self.get_intermediate(name='match_item')
 
-    def title_value(self) -> list:
-        name = 'name' + str(shared.item_name_number)
-        return self.get_text_values(field=name)
+    @property
+    def match_brand(self) -> dict:
+        return self.get_intermediate(name='match_brand')
 
-    def description_value(self) -> list:
-        return self.get_text_values(field='description')
+    @property
+    def match_attribute(self) -> dict:
+        return self.get_intermediate(name='match_attribute')
 
-    def inventory_value(self) -> list:
-        if not self.inventory:
-            self.inventory = self.get_inventory_values()
-        return ['0' if int(x) < 0 else x for x in self.inventory]
+    def get_value(self, name: str) -> list:
+        default = 'invalid column'
+        if name not in COLUMN_REGISTRY:
+            return default
+        return self.get_columns(header=[name])[name]
 
-    def availability_value(self) -> list:
-        if not self.inventory:
-            self.inventory = self.get_inventory_values()
-        return [availability_message(x) for x in self.inventory]
+    def get_intermediate(self, name: str):
+        """
+        Compute the intermediate on the first access and memoize it,
+        failures are memoized as well.
 
-    def condition_value(self) -> list:
-        return ['new' for x in self.variations]
+        Parameter:
+            name [str]              -   name within INTERMEDIATE_REGISTRY
 
-    def price_value(self) -> list:
-        return self.get_price_values()
+        Return:
+            [any]                   -   value of the intermediate
+        """
+        if name not in self.intermediates:
+            try:
+                self.intermediates[name] = INTERMEDIATE_REGISTRY[name](self)
+            except ColumnValueError as err:
+                self.intermediates[name] = err
+        value = self.intermediates[name]
+        if isinstance(value, ColumnValueError):
+            raise value
+        return value
 
-    def link_value(self) -> list:
-        return self.get_variation_property_values(property_type='url')
+    def get_columns(self, header: list) -> dict:
+        """
+        Fill all columns of the header within a single pass over the
+        variations.
+
+        Every column prepares a cell function once from its intermediates,
+        which creates the value of the column for a single variation, or
+        the value itself if it is the same for every variation. Columns
+        computed as array operations (stock and price) are filled as a
+        whole before the pass and the columns of the parent item are
+        computed once per item.
+        A column, which cannot be filled for one of the variations, is left
+        empty, just like when it is requested on its own.
 
-    def image_link_value(self) -> list:
-        return self.get_image_url_value()
+        Parameter:
+            header [list]           -   list of facebook catalog column names
 
-    def brand_value(self) -> list:
-        return [self.match_brand[str(x['itemId'])] for x in self.variations]
+        Return:
+            [dict]                  -   values for every variation per column
+        """
+        failed: list = []
+        constants: dict = {}
+        whole_columns: dict = {}
+        names: list = []
+        cells: list = []
+        reads_item = False
+        for name in header:
+            spec = COLUMN_REGISTRY.get(name)
+            if spec is None:
+                failed.append(name)
+                continue
+            try:
+                cell = spec.build(self, **{
+                    required: self.get_intermediate(name=required)
+                    for required in spec.requires})
+            except ColumnValueError as err:
+                self.__column_failed(name=name, error=err, failed=failed)
+                continue
+            if spec.whole:
+                whole_columns[name] = cell
+                continue
+            if isinstance(cell, str):
+                constants[name] = cell
+                continue
+            if spec.item:
+                cell = broadcast_per_item(cell=cell)
+                reads_item = True
+            names.append(name)
+            cells.append(cell)
+
+        match_item = self.match_item if reads_item else None
+        rows: list = []
+        for variation in self.variations:
+            item = match_item.get(str(variation.id)) if match_item else None
+            try:
+                rows.append([cell(variation, item) for cell in cells])
+            except ColumnValueError:
+                rows.append(self.__get_row_with_failures(
+                    variation=variation, item=item, names=names,
+                    cells=cells, failed=failed))
+
+        columns = {name: list(values)
+                   for name, values in zip(names, zip(*rows))}
+        columns.update(whole_columns)
+        for name in header:
+            if name in constants:
+                columns[name] = [constants[name]] * len(self.variations)
+            elif name in failed or name not in columns:
+                columns[name] = []
+        return {name: columns[name] for name in header}
+
+    def __get_row_with_failures(self, variation: VariationRecord,
+                                item: dict, names: list, cells: list,
+                                failed: list) -> list:
+        """
+        Fill the row cell by cell and replace the cells of failed columns,
+        so that the remaining variations skip them.
+        """
+        row: list = []
+        for index, cell in enumerate(cells):
+            try:
+                row.append(cell(variation, item))
+            except ColumnValueError as err:
+                self.__column_failed(name=names[index], error=err,
+                                     failed=failed)
+                cells[index] = skip_cell
+                row.append(None)
+        return row
+
+    @staticmethod
+    def __column_failed(name: str, error: Exception, failed: list) -> None:
+        if str(error):
+            logger.error(str(error))
+        failed.append(name)
+
+    @register_column('id')
+    def id_cell(self):
+        return lambda variation, item: variation.number
+
+    @register_column('title', requires=('texts',), item=True)
+    def title_cell(self, texts: dict):
+        return self.get_text_cell(
+            field='name' + str(shared.item_name_number), texts=texts)
+
+    @register_column('description', requires=('texts',), item=True)
+    def description_cell(self, texts: dict):
+        return self.get_text_cell(field='description', texts=texts)
+
+    @register_column('inventory', requires=('stock',), whole=True)
+    def inventory_column(self, stock) -> list:
+        return columnar.clamp_inventory(stock=stock)
+
+    @register_column('availability', requires=('stock',), whole=True)
+    def availability_column(self, stock) -> list:
+        return columnar.availability_messages(stock=stock)
+
+    @register_column('condition')
+    def condition_cell(self):
+        return 'new'
+
+    @register_column('price', requires=('prices',), whole=True)
+    def price_column(self, prices) -> list:
+        return columnar.format_prices(cents=columnar.to_cents(prices=prices),
+                                      **shared.price_format)
+
+    @register_column('link')
+    def link_cell(self):
+        return self.get_variation_property_cell(property_type='url')
+
+    @register_column('image_link', requires=('image_key',))
+    def image_link_cell(self, image_key: tuple):
+        return self.get_image_url_cell(key=image_key)
+
+    @register_column('brand', requires=('match_brand',), item=True)
+    def brand_cell(self, match_brand: dict):
+        return lambda variation, item: match_brand[str(variation.item_id)]
+
+    @register_column('google_product_category',
+                     requires=('item_properties',), item=True)
+    def google_product_category_cell(self, item_properties: tuple):
+        return self.__get_item_property_cell(
+            property_type='google_category', item_properties=item_properties)
+
+    @register_column('sale_price')
+    def sale_price_cell(self):
+        return ''
 
-    def google_product_category_value(self) -> list:
-        return self.__get_item_property_values(property_type='google_category')
+    @register_column('sale_price_effective_date')
+    def sale_price_effective_date_cell(self):
+        return ''
 
-    def sale_price_value(self) -> list:
-        return self.empty_values()
+    @register_column('item_group_id')
+    def item_group_id_cell(self):
+        return lambda variation, item: str(variation.item_id)
 
-    def sale_price_effective_date_value(self) -> list:
-        return self.empty_values()
+    @register_column('gender', requires=('item_properties',), item=True)
+    def gender_cell(self, item_properties: tuple):
+        return self.__get_item_property_cell(
+            property_type='gender', item_properties=item_properties)
 
-    def item_group_id_value(self) -> list:
-        return [str(x['itemId']) for x in self.variations]
+    @register_column('color', requires=('match_attribute',))
+    def color_cell(self, match_attribute: dict):
+        return self.get_attribute_cell(attribute_type='color',
+                                       match_attribute=match_attribute)
 
-    def gender_value(self) -> list:
-        return self.__get_item_property_values(property_type='gender')
+    @register_column('size', requires=('match_attribute',))
+    def size_cell(self, match_attribute: dict):
+        return self.get_attribute_cell(attribute_type='size',
+                                       match_attribute=match_attribute)
 
-    def color_value(self) -> list:
-        return self.get_attribute_values(attribute_type='color')
+    @register_column('age_group', requires=('item_properties',), item=True)
+    def age_group_cell(self, item_properties: tuple):
+        return self.__get_item_property_cell(
+            property_type='age', item_properties=item_properties)
 
-    def size_value(self) -> list:
-        return self.get_attribute_values(attribute_type='size')
+    @register_column('material')
+    def material_cell(self):
+        return self.get_variation_property_cell(property_type='material')
 
-    def age_group_value(self) -> list:
-        return self.__get_item_property_values(property_type='age')
+    @register_column('pattern')
+    def pattern_cell(self):
+        return ''
 
-    def material_value(self) -> list:
-        return self.get_variation_property_values(property_type='material')
+    @register_column('product_type')
+    def product_type_cell(self):
+        return ''
 
-    def pattern_value(self) -> list:
-        return self.empty_values()
+    @register_column('shipping')
+    def shipping_cell(self):
+        return ''
 
-    def product_type_value(self) -> list:
-        return self.empty_values()
+    @register_column('shipping_weight')
+    def shipping_weight_cell(self):
+        return lambda variation, item: str(f"{variation.weight} g")
+
+    @register_intermediate('match_item')
+    def get_match_item(self) -> dict:
+        """ Map the variation IDs to their parent items """
+        items = self.tables.items
+        if items is None:
+            return {}
+        return {str(var.id): items[var.item_id] for var in self.variations
+                if var.item_id in items}
+
+    @register_intermediate('match_brand')
+    def get_match_brand(self) -> dict:
+        """ Map the item IDs to the names of their manufacturers """
+        items = self.tables.items
+        if items is None or self.tables.manufacturers is None:
+            return {}
+        if any(item['manufacturerId'] not in self.tables.manufacturers
+               for item in items.values() if item['manufacturerId']):
+            self.refresh_manufacturers()
+        manufacturers = self.tables.manufacturers
+        return {str(item['id']): manufacturers[item['manufacturerId']]
+                for item in items.values()
+                if item['manufacturerId'] in manufacturers}
+
+    @register_intermediate('match_attribute')
+    def get_match_attribute(self) -> dict:
+        """ Map the attribute IDs to the names of their values """
+        if self.tables.attributes is None:
+            return {}
+        stale_ids = self.get_stale_attribute_ids()
+        if stale_ids:
+            self.refresh_attributes(attribute_ids=stale_ids)
+        return self.tables.attributes
+
+    @register_intermediate('texts')
+    def get_texts(self) -> dict:
+        return self.tables.texts
+
+    @register_intermediate('item_properties')
+    def get_item_properties(self) -> tuple:
+        return (self.tables.item_properties, self.tables.property_selections)
+
+    @register_intermediate('image_key')
+    def get_image_key(self) -> tuple:
+        return get_image_match_key(criteria=shared.img_match_criteria)
+
+    def refresh_manufacturers(self) -> None:
+        """
+        Fetch the manufacturers again without the cache, as the cached
+        response lacks manufacturers created after it was stored.
+        """
+        if not refresh_allowed(tables=self.tables, entity='manufacturers'):
+            return
+        logger.info("Manufacturer of an item missing in the cached "
+                    "manufacturers, fetch them again.")
+        manufacturers = cached_request(
+            entity='manufacturers',
+            request=self.plenty.plenty_api_get_manufacturers, refresh=True)
+        if manufacturers:
+            self.tables.manufacturers = {x['id']: x['name']
+                                         for x in manufacturers}
+
+    def get_stale_attribute_ids(self) -> list:
+        """
+        Collect the configured attributes, of which a variation uses a value
+        missing in the attribute index, e.g. a color added after the
+        attribute was cached.
 
-    def shipping_value(self) -> list:
-        return self.empty_values()
+        Return:
+            [list]                  -   sorted attribute IDs
+        """
+        attributes = self.tables.attributes
+        configured = set(get_attribute_ids(header=self.header))
+        stale_ids: set = set()
+        for variation in self.variations:
+            for attribute_id, value_id in variation.attributes or ():
+                if (attribute_id in configured and value_id and
+                        str(value_id) not in attributes.get(
+                            str(attribute_id), {})):
+                    stale_ids.add(attribute_id)
+        return sorted(stale_ids)
+
+    def refresh_attributes(self, attribute_ids: list) -> None:
+        """
+        Fetch the given attributes again without the cache and replace them
+        within the attribute index and the cache.
 
-    def shipping_weight_value(self) -> list:
-        return [str(f"{x['weightG']} g") for x in self.variations]
+        Parameter:
+            attribute_ids [list]    -   IDs of the stale attributes
+        """
+        attribute_ids = [
+            attribute_id for attribute_id in attribute_ids
+            if refresh_allowed(tables=self.tables,
+                               entity=f'attributes/{attribute_id}')]
+        if not attribute_ids:
+            return
+        logger.info(f"Attribute values missing in the cached attributes "
+                    f"{attribute_ids}, fetch them again.")
+        attributes = cached_request_by_id(
+            entity='attributes', ids=attribute_ids, request=get_attributes,
+            refresh=True)
+        match_attribute = self.build_attribute_map(attributes=attributes)
+        if match_attribute:
+            self.tables.add_attributes(attributes=match_attribute)
+
+    @staticmethod
+    def build_attribute_map(attributes: list) -> dict:
+        """
+        Map the value IDs of the fetched attributes to their names in the
+        configured language (@shared.lang).
 
-    def empty_values(self) -> list:
-        return ['' for x in self.variations]
+        Parameter:
+            attributes [list]       -   attributes with their values
 
-    def build_attribute_map(self) -> dict:
-        attributes = self.plenty.plenty_api_get_attributes(
-            additional=['values'])
+        Return:
+            [dict]                  -   attribute ID -> value ID -> name
+        """
+        match_attribute: dict = {}
         if not attributes:
             logger.error("ERROR: get attributes request to the PlentyMarkets"
                          " API failed!")
+            return match_attribute
         for attribute in attributes:
-            self.match_attribute.update({str(attribute['id']): {}})
+            match_attribute.update({str(attribute['id']): {}})
             for val in attribute['values']:
                 value = ''
                 for name in val['valueNames']:
                     if name['lang'].lower() == shared.lang:
                         value = name['name']
-                self.match_attribute[
+                match_attribute[
                     str(attribute['id'])].update({str(val['id']): value})
+        return match_attribute
+
+    def get_item_ids(self) -> list:
+        """
+        Collect the parent item IDs of all variations of the referrer.
+
+        Return:
+            [list]                  -   sorted unique item IDs
+        """
+        if shared.plenty_variations:
+            variations = to_records(variations=shared.plenty_variations)
+        else:
+            variations = self.variations
+        return sorted({var.item_id for var in variations})
+
+    def get_reference_data(self, tables: 'MatchTables') -> dict:
+        """
+        Fetch the items, manufacturers and attributes required for the
+        header, which are not part of the match tables of the run yet.
+        Responses prefetched by the CLI are used directly.
+
+        Parameter:
+            tables [MatchTables]    -   match tables of the run
+
+        Return:
+            [dict]                  -   response for each entity
+        """
+        reference_requests = get_reference_requests(
+            header=self.header, item_ids=self.get_item_ids())
+        responses: dict = {}
+        attribute_keys = [str(attribute_id) for attribute_id
+                          in get_attribute_ids(header=self.header)]
+        for entity in list(reference_requests):
+            keys = attribute_keys if entity == 'attributes' else None
+            if tables.contains(entity=entity, keys=keys):
+                del reference_requests[entity]
+            elif shared.reference_data.get(entity):
+                responses[entity] = shared.reference_data[entity]
+                del reference_requests[entity]
+        responses.update(run_parallel(tasks=reference_requests,
+                                      workers=shared.max_workers))
+        return responses
 
     def build_matchtables(self) -> bool:
         """
         Create a match table to quickly locate corresponding data.
 
-        Fetch the data from Plentymarkets in order to create a:
-        Variation to item map, Item to manufacturer map and
-        attribute value to attribute value ID map.
+        Fetch the items, manufacturers and attributes required by the
+        header from Plentymarkets, from which the variation to item map,
+        item to manufacturer map and attribute value ID to attribute value
+        map are created on demand.
+
+        The item, manufacturer and attribute indexes are kept within the
+        match tables of the run (@shared.match_tables), so that later
+        instances only fetch the entities missing for their header.
 
         Return:
             [bool]                  -   Return False if any API call failed.
         """
-        if any(item in self.header for item in ITEM_TYPE_COLUMNS):
-            items = self.plenty.plenty_api_get_items(
-                additional=['itemProperties'], lang=shared.lang)
-            if not items:
+        tables = shared.match_tables
+        if tables is None:
+            tables = MatchTables()
+        self.tables = tables
+        responses = self.get_reference_data(tables=tables)
+        if 'items' in responses:
+            if not responses['items']:
                 logger.error("ERROR: get item request to the PlentyMarkets API"
                              " failed!")
                 return False
-
-            for var in self.variations:
-                self.match_item.update({str(var['id']): x for x in items
-                                        if x['id'] == var['itemId']})
-            if 'brand' in self.header:
-                manufact = self.plenty.plenty_api_get_manufacturers()
-                if not manufact:
-                    logger.error("ERROR: get manufacturers request to the"
-                                 " PlentyMarkets API failed!")
-                    return False
-                for item in items:
-                    self.match_brand.update(
-                        {str(item['id']): x['name'] for x in manufact
-                         if x['id'] == item['manufacturerId']})
-
-        if any(item in self.header for item in ATTRIBUTE_TYPE_COLUMNS):
-            self.build_attribute_map()
+            tables.set_items(items=responses['items'])
+        if 'manufacturers' in responses:
+            if not responses['manufacturers']:
+                logger.error("ERROR: get manufacturers request to the"
+                             " PlentyMarkets API failed!")
+                return False
+            tables.manufacturers = {x['id']: x['name']
+                                    for x in responses['manufacturers']}
+        if 'attributes' in responses:
+            match_attribute = self.build_attribute_map(
+                attributes=responses['attributes'])
+            if match_attribute:
+                tables.add_attributes(attributes=match_attribute)
         return True
 
-    def get_text_values(self, field: str) -> list:
+    def get_variation_index(self, variation: VariationRecord,
+                            resource: str) -> dict:
+        """
+        Get the entries of a variation sub-resource keyed by their ID.
+
+        The index of each sub-resource is built once per variation and kept
+        until the next variation is requested, as multiple columns read the
+        same sub-resource within a single pass.
+
+        Parameter:
+            variation [VariationRecord] - variation of the referrer
+            resource [str]          -   name of the record sub-resource
+
+        Return:
+            [dict]                  -   index of the sub-resource
+        """
+        cached = self.variation_index.get(resource)
+        if cached is None or cached[0] is not variation:
+            cached = (variation, build_variation_index(variation=variation,
+                                                       resource=resource))
+            self.variation_index[resource] = cached
+        return cached[1]
+
+    def get_text_cell(self, field: str, texts: dict):
         """
         Get the text value for either the name or the description.
 
@@ -207,167 +686,139 @@ class ColumnValuesFiller():
         Parameter:
             field [str]             -   Name of the key in the item texts
                                         field of the API response
+            texts [dict]            -   (item ID, lang) -> item text
 
         Return:
-            [list]                  -   value for every variation
+            [callable]              -   value for a single variation
         """
-        column: list = []
         if field not in VALID_TEXT_TYPES:
-            return []
-        for variation in self.variations:
-            text = self.match_item[str(variation['id'])]['texts'][0]
-            if text['lang'].lower() == shared.lang:
-                column.append("".join(text[field].splitlines()))
-            else:
-                column.append('')
-        return column
-
-    def get_attribute_values(self, attribute_type: str) -> list:
+            raise ColumnValueError()
+        lang = shared.lang
+
+        def cell(variation: VariationRecord, item: dict) -> str:
+            if item is None:
+                raise ColumnValueError(
+                    f"ERROR: missing item of variation {variation.id} from"
+                    " get_items API response")
+            text = texts.get((item['id'], lang))
+            if text is None:
+                return ''
+            return "".join(text[field].splitlines())
+        return cell
+
+    def get_attribute_cell(self, attribute_type: str,
+                           match_attribute: dict):
         """
         Get the attribute value for the configured attributes [Color, Size].
 
         Parameter:
             attribute_type [str]     -   first part of the variable name
                                          found in the shared module.
+            match_attribute [dict]   -   attribute ID -> value ID -> name
 
         Return:
-            [list]                  -   value for every variation
+            [callable]              -   value for a single variation
         """
-        column: list = []
         if attribute_type not in VALID_ATTRIBUTE_TYPES:
-            logger.error(f"ERROR: invalid attribute type {attribute_type}")
-            return []
+            raise ColumnValueError(
+                f"ERROR: invalid attribute type {attribute_type}")
 
         attribute_id: int = getattr(shared, attribute_type + '_attribute_id')
-        for variation in self.variations:
-            if 'variationAttributeValues' not in variation.keys():
-                logger.error("ERROR: variations without attribute data.")
-                return []
-            value = ''
-            val_id = 0
-            for attribute in variation['variationAttributeValues']:
-                if attribute['attributeId'] == int(attribute_id):
-                    val_id = attribute['valueId']
-            if val_id:
-                value = self.match_attribute[str(attribute_id)][str(val_id)]
-            column.append(value)
-        return column
-
-    def get_inventory_values(self) -> list:
+        int_attribute_id = int(attribute_id)
+
+        def cell(variation: VariationRecord, item: dict) -> str:
+            if variation.attributes is None:
+                raise ColumnValueError(
+                    "ERROR: variations without attribute data.")
+            val_id = self.get_variation_index(
+                variation=variation,
+                resource='attributes').get(int_attribute_id, 0)
+            if not val_id:
+                return ''
+            return match_attribute[str(attribute_id)][str(val_id)]
+        return cell
+
+    @register_intermediate('stock')
+    def get_stock_values(self):
         """
         Get the stock for each variation from the configured warehouse.
 
         Return:
-            [list]                  -   value for every variation
+            [ndarray]               -   value for every variation
         """
-        column: list = []
-        for variation in self.variations:
-            if 'stock' not in variation.keys():
-                logger.error("ERROR: variations without stock data.")
-                return []
-            value = 0
-            for stock in variation['stock']:
-                if stock['warehouseId'] == int(shared.warehouse_id):
-                    value = stock['netStock']
-            column.append(str(value))
-        return column
-
-    def get_price_values(self) -> list:
+        if any(variation.stock is None for variation in self.variations):
+            raise ColumnValueError("ERROR: variations without stock data.")
+        return columnar.select_sub_resource_values(
+            variations=self.variations, resource='stock',
+            target=int(shared.warehouse_id))
+
+    @register_intermediate('prices')
+    def get_price_values(self):
         """
         Get the price which is available for the facebook referrer.
 
         Return:
-            [list]                  -   value for every variation
+            [ndarray]               -   value for every variation
         """
-        column: list = []
-        for variation in self.variations:
-            if 'variationSalesPrices' not in variation.keys():
-                logger.error("ERROR: variations without price data.")
-                return []
-            value = 0
-            for price in variation['variationSalesPrices']:
-                if price['salesPriceId'] == int(shared.price_id):
-                    value = price['price']
-            if value == 0:
-                logger.error(f"ERROR: variation {variation['id']} has no price"
-                             f" with price ID: {shared.price_id}")
-                return []
-            column.append(to_euro(value))
-        return column
-
-    def __get_item_property_values(self, property_type: str) -> list:
+        if any(variation.prices is None for variation in self.variations):
+            raise ColumnValueError("ERROR: variations without price data.")
+        prices = columnar.select_sub_resource_values(
+            variations=self.variations, resource='prices',
+            target=int(shared.price_id))
+        missing = np.flatnonzero(prices == 0)
+        if len(missing) > 0:
+            raise ColumnValueError(
+                f"ERROR: variation {self.variations[missing[0]].id} has no"
+                f" price with price ID: {shared.price_id}")
+        return prices
+
+    def __get_item_property_cell(self, property_type: str,
+                                 item_properties: tuple):
         """
-        Get the property value for one of the specified variation properties.
+        Get the property value for one of the specified item properties.
 
         Fetch the value for the language which was assigned to the
         @shared.lang variable through the configuration file. If no
         value is found for the desired language leave the field empty.
+        Selection properties use the name of the selected value.
 
         Parameter:
             property_type [str]     -   first part of the variable name
                                         found in the shared module.
+            item_properties [tuple] -   property values and selection
+                                        names of the match tables
 
         Return:
-            [list]                  -   value for every variation
+            [callable]              -   value for a single variation
         """
-        column: list = []
         if property_type not in VALID_ITEM_PROPERTIES:
-            logger.error(f"ERROR: invalid item property type {property_type}")
-            return []
+            raise ColumnValueError(
+                f"ERROR: invalid item property type {property_type}")
 
-        prop_id: int = getattr(shared, property_type + '_property_id')
-        for variation in self.variations:
+        prop_id = int(getattr(shared, property_type + '_property_id'))
+        lang = shared.lang
+        item_properties, selections = item_properties
+
+        def cell(variation: VariationRecord, item: dict) -> str:
             value = ''
-            try:
-                props = self.match_item[str(variation['id'])]['itemProperties']
-            except KeyError:
-                logger.error("ERROR: missing item properties from get_items"
-                             " API response")
-                return []
-            for prop in props:
-                if not prop['propertyId'] == int(prop_id):
-                    continue
-                if ('propertySelectionId' in prop.keys() and
-                        prop['propertySelectionId']):
-                    value = self.__get_item_property_from_selection_list(
-                        item_property=prop)
-                elif prop['valueTexts']:
-                    value = self.__get_item_property_from_text_values(
-                        item_property=prop, property_type=property_type)
+            if not item or 'itemProperties' not in item:
+                raise ColumnValueError("ERROR: missing item properties from"
+                                       " get_items API response")
+            selection_id, texts = item_properties.get((item['id'], prop_id),
+                                                      (None, {}))
+            if selection_id:
+                value = selections.get((prop_id, selection_id, lang), '')
+            elif lang in texts:
+                value = texts[lang]
+                # Facebook expects the english age group
+                if property_type == 'age' and 'en' in texts:
+                    value = texts['en']
             if property_type == 'age' and not value:
                 value = 'Adult'
-            column.append(value)
-        return column
-
-    def __get_item_property_from_selection_list(self,
-                                                item_property: dict) -> str:
-        for select in item_property['propertySelection']:
-            if select['id'] == item_property['propertySelectionId']:
-                continue
-            if select['lang'] == shared.lang:
-                return select['name']
-        return ''
+            return value
+        return cell
 
-    def __get_item_property_from_text_values(self,
-                                             item_property: dict,
-                                             property_type: str) -> str:
-        # check if the desired language value exists
-        langs = [x['lang'].lower() for x in item_property['valueTexts']]
-        if shared.lang not in langs:
-            return ''
-
-        for text in item_property['valueTexts']:
-            if property_type == 'age':
-                if text['lang'].lower() == 'en':
-                    if text['value'].lower() not in ['adult', 'child']:
-                        # default to Adult if no valid value is found
-                        value = 'Adult'
-                    value = text['value']
-            if text['lang'].lower() == shared.lang:
-                value = text['value']
-        return value
-
-    def get_variation_property_values(self, property_type: str) -> list:
+    def get_variation_property_cell(self, property_type: str):
         """
         Get the property value for one of the specified variation properties.
 
@@ -384,61 +835,118 @@ class ColumnValuesFiller():
                                         found in the shared module.
 
         Return:
-            [list]                  -   value for every variation
+            [callable]              -   value for a single variation
         """
-        column = []
         if property_type not in VALID_VARIATION_PROPERTIES:
-            logger.error("ERROR: invalid variation property type "
-                         f"{property_type}")
-            return []
+            raise ColumnValueError("ERROR: invalid variation property type "
+                                   f"{property_type}")
+
+        prop_id = int(getattr(shared, property_type + '_property_id'))
+        lang = shared.lang
+
+        def cell(variation: VariationRecord, item: dict) -> str:
+            if variation.properties is None:
+                raise ColumnValueError(
+                    "ERROR: variations without property data.")
+            relation_values = self.get_variation_index(
+                variation=variation, resource='properties').get(prop_id)
+            if not relation_values:
+                return ''
+            value = get_relation_value(relation_values=relation_values,
+                                       lang=lang,
+                                       fallback=property_type == 'url')
+            return '' if value is None else value
+        return cell
+
+    def get_image_url_cell(self, key: tuple):
+        """
+        Get the image with the lowest position of every variation, among
+        the images available for the configured criteria (e.g. the
+        Facebook referrer).
 
-        prop_id: int = getattr(shared, property_type + '_property_id')
-        for variation in self.variations:
-            if 'properties' not in variation.keys():
-                logger.error("ERROR: variations without property data.")
-                return []
-            value = ''
-            for prop in variation['properties']:
-                # check if the desired language value exists
-                langs = [x['lang'].lower() for x in prop['relationValues']]
-                if shared.lang not in langs:
-                    if property_type != 'url' or not langs:
-                        continue
-                    lang_choice = langs[0]
-                else:
-                    lang_choice = shared.lang
-
-                if prop['propertyId'] == int(prop_id):
-                    for rel_val in prop['relationValues']:
-                        if rel_val['lang'].lower() == lang_choice:
-                            value = rel_val['value']
-            column.append(value)
-        return column
-
-    def get_image_url_value(self) -> list:
-        """
-        Get the first image of every variation which is available for
-        the Facebook referrer.
+        Parameter:
+            key [tuple]             -   (type, value) of the criteria
 
         Return:
-            [list]                  -   value for every variation
+            [callable]              -   value for a single variation
         """
-        column: list = []
-        for variation in self.variations:
-            if 'images' not in variation.keys():
-                logger.error("ERROR: variations without image data.")
-                return []
-            value = ''
-            img = get_first_picture(images=variation['images'])
-            if img:
-                for avail in img['availabilities']:
-                    match_type = shared.img_match_criteria['type']
-                    match_value = shared.img_match_criteria['value']
-                    if (avail['type'] == match_type and
-                            avail['value'] == int(match_value)):
-                        value = img['url']
-            column.append(value)
-        return column
+        def cell(variation: VariationRecord, item: dict) -> str:
+            if variation.images is None:
+                raise ColumnValueError("ERROR: variations without image data.")
+            return select_image_url(images=variation.images, key=key)
+        return cell
+
+
+def build_variation_index(variation: VariationRecord, resource: str) -> dict:
+    """
+    Key the entries of a record sub-resource by their ID, later entries
+    replace earlier ones with the same ID.
+
+    The properties map the property ID to the (language, value) pairs,
+    properties without values are left out.
+
+    Parameter:
+        variation   [VariationRecord] - variation of the referrer
+        resource    [str]       -   name of the record sub-resource
+
+    Return:
+                    [dict]      -   index of the sub-resource
+    """
+    entries = getattr(variation, resource)
+    if resource != 'properties':
+        return dict(entries)
+    return {prop_id: values for prop_id, values in entries if values}
+
+
+def get_relation_value(relation_values: tuple, lang: str,
+                       fallback: bool = False) -> str:
+    """
+    Pick the value of a property in the given language.
+
+    Parameter:
+        relation_values [tuple] -   (language, value) pairs of a property
+        lang            [str]   -   desired language
+        fallback        [bool]  -   use the first available language if
+                                    the desired language is missing
+
+    Return:
+                        [str]   -   value, None if the language is missing
+    """
+    value = None
+    for value_lang, text in relation_values:
+        if value_lang == lang:
+            value = text
+    if value is None and fallback:
+        return get_relation_value(relation_values=relation_values,
+                                  lang=relation_values[0][0])
+    return value
+
+
+def skip_cell(variation: VariationRecord, item: dict) -> None:
+    """ Placeholder for the cells of a column, which failed to be filled """
+    return None
+
+
+def broadcast_per_item(cell):
+    """
+    Compute the value of an item-level cell once per parent item and hand
+    the same value to all variations of the item.
+
+    Parameter:
+        cell        [callable]  -   cell function of an item-level column
+
+    Return:
+                    [callable]  -   cell function with a per item cache
+    """
+    values: dict = {}
+
+    def item_cell(variation: VariationRecord, item: dict) -> str:
+        try:
+            return values[variation.item_id]
+        except KeyError:
+            value = values[variation.item_id] = cell(variation, item)
+            return value
+    return item_cell
 
 
 def get_data_from_plentymarkets(header: list = None,
@@ -456,14 +964,14 @@ def get_data_from_plentymarkets(header: list = None,
                                     for all variations with the given
                                     referrer ID.
     """
-    columns: dict = {}
-
-    variations = copy.deepcopy(shared.plenty_variations)
+    # The records are only read, so the shared list is used without a copy
+    variations = to_records(variations=shared.plenty_variations)
     if ((target is None or len(target) == 0) and
             (header is None or len(header) == 0)):
         return pandas.DataFrame()
     if target is not None and len(target) > 0:
-        variations = [var for var in variations if var['number'] in target]
+        target = set(target)
+        variations = [var for var in variations if var.number in target]
         if len(variations) == 0:
             return pandas.DataFrame()
 
@@ -483,36 +991,179 @@ def get_data_from_plentymarkets(header: list = None,
     if not column_value_filler.matchtables:
         return pandas.DataFrame()
 
-    for col in header:
-        columns[col] = column_value_filler.get_value(name=col)
+    columns = column_value_filler.get_columns(header=header)
 
     return pandas.DataFrame.from_dict(columns)
 
 
-def availability_message(stock: int) -> str:
-    if int(stock) > 0:
-        return "in stock"
-    return "out of stock"
+def get_items(item_ids: list) -> list:
+    """
+    Fetch the items with their properties in batches of item IDs.
+
+    Parameter:
+        item_ids    [list]      -   IDs of the required items
+
+    Return:
+                    [list]      -   items, empty if any request failed
+    """
+    items: list = []
+    for start in range(0, len(item_ids), ITEM_ID_BATCH_SIZE):
+        batch = item_ids[start:start + ITEM_ID_BATCH_SIZE]
+        response = fetch.get_items(
+            api=shared.plenty_api_instance,
+            refine={'id': ','.join(str(x) for x in batch)},
+            additional=['itemProperties'], lang=shared.lang)
+        if not response:
+            return []
+        items += response
+    return items
+
+
+def get_attributes(attribute_ids: list) -> list:
+    """
+    Fetch the attributes with the given IDs together with their values.
+
+    Parameter:
+        attribute_ids [list]    -   IDs of the required attributes
+
+    Return:
+                    [list/None] -   attributes, None if any request failed
+    """
+    return fetch.get_attributes(api=shared.plenty_api_instance,
+                                attribute_ids=attribute_ids)
 
 
-def to_euro(price: float):
-    """ Turn the price in to the accepted format: [{EUR},{CENT} {CURRENCY}]"""
-    euro: int = price // 1
-    cent: int = price - euro
-    return str(f"{int(euro)},{int(cent*100):02} EUR")
+def get_attribute_ids(header: list) -> list:
+    """
+    Collect the configured attribute IDs of the attribute columns within
+    the header, columns without a configured attribute are skipped.
 
+    Parameter:
+        header      [list]      -   google sheet header subset
 
-def get_first_picture(images: list) -> dict:
-    min_pos = -1
-    if not images:
-        return {}
+    Return:
+                    [list]      -   attribute IDs
+    """
+    attribute_ids: list = []
+    for column in ATTRIBUTE_TYPE_COLUMNS:
+        if column not in header:
+            continue
+        attribute_id = int(getattr(shared, column + '_attribute_id') or 0)
+        if attribute_id and attribute_id not in attribute_ids:
+            attribute_ids.append(attribute_id)
+    return attribute_ids
 
-    for img in images:
-        if min_pos == -1 or img['position'] < min_pos:
-            min_pos = img['position']
 
-    for img in images:
-        if img['position'] == min_pos:
-            return img
+def refresh_allowed(tables: MatchTables, entity: str) -> bool:
+    """
+    Check if a possibly stale cached response of the entity may be
+    replaced: only responses of an active cache can be stale and each of
+    them is fetched again at most once per run.
+
+    Parameter:
+        tables      [MatchTables] - match tables of the run
+        entity      [str]       -   name of the entity (and ID)
+
+    Return:
+                    [bool]
+    """
+    cache = shared.reference_cache
+    if cache is None or cache.refresh or entity in tables.refreshed:
+        return False
+    tables.refreshed.add(entity)
+    return True
+
 
-    return {}
+def get_reference_requests(header: list, item_ids: list = None) -> dict:
+    """
+    Collect the requests for the items, manufacturers and attributes
+    required by the columns. None of the requests depends on another.
+
+    Parameter:
+        header      [list]      -   google sheet header subset
+        item_ids    [list]      -   IDs of the required items, the item
+                                    request is skipped without them
+
+    Return:
+                    [dict]      -   callable request for each entity
+    """
+    api = shared.plenty_api_instance
+    reference_requests: dict = {}
+    if any(item in header for item in ITEM_TYPE_COLUMNS):
+        if item_ids is not None:
+            reference_requests['items'] = lambda: cached_request_by_id(
+                entity='items', ids=item_ids, key=shared.lang,
+                request=get_items)
+        if 'brand' in header:
+            reference_requests['manufacturers'] = lambda: cached_request(
+                entity='manufacturers',
+                request=api.plenty_api_get_manufacturers)
+    attribute_ids = get_attribute_ids(header=header)
+    if attribute_ids:
+        reference_requests['attributes'] = lambda: cached_request_by_id(
+            entity='attributes', ids=attribute_ids, request=get_attributes)
+    return reference_requests
+
+
+def get_variation_resources(header: list) -> list:
+    """
+    Collect the variation sub-resources required for the given columns.
+
+    Parameter:
+        header      [list]      -   google sheet header subset
+
+    Return:
+                    [list]      -   'additional' argument for the
+                                    get variations request
+    """
+    resources: list = []
+    for column in header:
+        for resource in VARIATION_RESOURCE_MAP.get(column, []):
+            if resource not in resources:
+                resources.append(resource)
+    return resources
+
+
+def get_image_match_key(criteria: dict) -> tuple:
+    """
+    Create the (type, value) pair, which is compared with the
+    availabilities of the images.
+
+    Numeric values are converted into a number, so that the configured
+    text matches the numbers of the API response (e.g. '4' -> 4,
+    '4.01' -> 4.01).
+
+    Parameter:
+        criteria    [dict]      -   configured image match criteria
+
+    Return:
+                    [tuple]     -   (availability type, value)
+    """
+    value = criteria.get('value', '')
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        pass
+    return (criteria.get('type', ''), value)
+
+
+def select_image_url(images: tuple, key: tuple) -> str:
+    """
+    Get the URL of the image with the lowest position, among the images
+    available for the match criteria, within a single pass.
+
+    Parameter:
+        images      [tuple]     -   (position, URL, availabilities) of the
+                                    images of a variation
+        key         [tuple]     -   (type, value) from get_image_match_key
+
+    Return:
+                    [str]       -   URL, empty if no image matches
+    """
+    url = ''
+    lowest = None
+    for position, image_url, availabilities in images:
+        if (lowest is None or position < lowest) and key in availabilities:
+            lowest = position
+            url = image_url
+    return url
@@ -0,0 +1,131 @@
+"""
+Synchronize a google sheet with data from PlentyMarkets.
+The google sheet is used as a data feed for a facebook product catalog.
+
+Copyright (C) 2020  Sebastian Fricke, Panasiam
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Compact records of the variations, which keep only the fields read by the
+columns of the google sheet.
+
+The sub-resources are stored as tuples of the relevant values instead of
+the dictionaries of the API response, so that the raw response can be
+dropped right after it was parsed.
+"""
+import sys
+
+
+class VariationRecord():
+    """
+    Fields of a single variation required to fill the columns.
+
+    A sub-resource, which was not part of the API response, is None.
+
+        stock       [tuple]     -   (warehouse ID, net stock)
+        prices      [tuple]     -   (sales price ID, price)
+        attributes  [tuple]     -   (attribute ID, attribute value ID)
+        properties  [tuple]     -   (property ID, ((language, value), ..))
+        images      [tuple]     -   (position, URL, ((type, value), ..))
+    """
+    __slots__ = ('id', 'number', 'item_id', 'is_main', 'weight', 'stock',
+                 'prices', 'attributes', 'properties', 'images')
+
+    def __init__(self, variation: dict):
+        """
+        Parameter:
+            variation   [dict]  -   variation from the API response
+        """
+        self.id: int = variation['id']
+        self.number: str = variation.get('number', '')
+        self.item_id: int = variation.get('itemId', 0)
+        self.is_main: bool = variation.get('isMain', False)
+        self.weight = variation.get('weightG', 0)
+        self.stock: tuple = parse_pairs(
+            entries=variation.get('stock'), key='warehouseId',
+            value='netStock')
+        self.prices: tuple = parse_pairs(
+            entries=variation.get('variationSalesPrices'),
+            key='salesPriceId', value='price')
+        self.attributes: tuple = parse_pairs(
+            entries=variation.get('variationAttributeValues'),
+            key='attributeId', value='valueId')
+        self.properties: tuple = parse_properties(
+            properties=variation.get('properties'))
+        self.images: tuple = parse_images(images=variation.get('images'))
+
+
+def parse_pairs(entries: list, key: str, value: str) -> tuple:
+    if entries is None:
+        return None
+    return tuple((entry[key], entry[value]) for entry in entries)
+
+
+def parse_properties(properties: list) -> tuple:
+    if properties is None:
+        return None
+    return tuple(
+        (prop['propertyId'],
+         tuple((sys.intern(rel_val['lang'].lower()), rel_val['value'])
+               for rel_val in prop['relationValues']))
+        for prop in properties)
+
+
+def parse_images(images: list) -> tuple:
+    if images is None:
+        return None
+    return tuple(
+        (img['position'], img['url'],
+         tuple((sys.intern(avail['type']), avail['value'])
+               for avail in img['availabilities']))
+        for img in images)
+
+
+def parse_variations(variations: list) -> list:
+    """
+    Turn the variations of an API response into records and remove each
+    raw variation from the list as soon as it is parsed.
+
+    Parameter:
+        variations  [list]      -   variations from the API response,
+                                    empty after the call
+
+    Return:
+                    [list]      -   VariationRecord instances
+    """
+    records: list = []
+    for index, variation in enumerate(variations):
+        records.append(VariationRecord(variation=variation))
+        variations[index] = None
+    variations.clear()
+    return records
+
+
+def to_records(variations: list) -> list:
+    """
+    Get records for a list of raw variations or records, without changing
+    the list.
+
+    Parameter:
+        variations  [list]      -   variations or VariationRecord instances
+
+    Return:
+                    [list]      -   VariationRecord instances
+    """
+    if not variations:
+        return []
+    return [var if isinstance(var, VariationRecord)
+            else VariationRecord(variation=var) for var in variations]
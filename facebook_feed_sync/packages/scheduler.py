@@ -0,0 +1,162 @@
+"""
+Synchronize a google sheet with data from PlentyMarkets.
+The google sheet is used as a data feed for a facebook product catalog.
+
+Copyright (C) 2020  Sebastian Fricke, Panasiam
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU Affero General Public License as published
+by the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU Affero General Public License for more details.
+
+You should have received a copy of the GNU Affero General Public License
+along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+---
+
+Keep the requests to PlentyMarkets within the call limits of the account.
+
+PlentyMarkets reports the remaining calls of the short and the long period
+within the response headers. The scheduler reduces the amount of
+concurrent requests when the remaining calls run low and holds back every
+request until the period resets once only the reserved calls are left.
+"""
+import threading
+import time
+from loguru import logger
+
+
+# Response headers with the remaining calls and the seconds until the
+# period resets
+LIMIT_HEADERS = {
+    'short': ('X-Plenty-Global-Short-Period-Calls-Left',
+              'X-Plenty-Global-Short-Period-Decay'),
+    'long': ('X-Plenty-Global-Long-Period-Calls-Left',
+             'X-Plenty-Global-Long-Period-Decay')
+}
+DEFAULT_RESERVE = 5
+# Pause after a throttled request without a decay header
+THROTTLE_WAIT = 3
+
+
+def get_header_value(headers, key: str) -> int:
+    """ Return the header as integer or None if it is missing or invalid """
+    if not headers:
+        return None
+    value = headers.get(key)
+    if value is None:
+        return None
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestScheduler():
+    """
+    Queue requests to PlentyMarkets according to the call limits.
+
+    Every request has to acquire a slot before it is sent and release it
+    with the response headers afterwards.
+    """
+    def __init__(self, max_workers: int = 1,
+                 reserve: int = DEFAULT_RESERVE):
+        """
+        Parameter:
+            max_workers [int]   -   maximum amount of concurrent requests
+            reserve     [int]   -   calls per period left to other tools
+        """
+        self.max_workers: int = max(1, max_workers)
+        self.reserve: int = max(0, reserve)
+        self.concurrency: int = self.max_workers
+        self.active: int = 0
+        self.resume_at: float = 0
+        self.__condition = threading.Condition()
+
+    def acquire(self) -> None:
+        """ Wait until a request is allowed to be sent """
+        with self.__condition:
+            while True:
+                wait = self.resume_at - time.monotonic()
+                if wait > 0:
+                    self.__condition.wait(timeout=wait)
+                    continue
+                if self.active < self.concurrency:
+                    self.active += 1
+                    return
+                self.__condition.wait()
+
+    def release(self, headers=None) -> None:
+        """
+        Free the slot of a finished request and adjust the pacing to the
+        call limits reported by its response headers.
+
+        Parameter:
+            headers     [dict]  -   response headers, None if unknown
+        """
+        with self.__condition:
+            self.active = max(0, self.active - 1)
+            self.__update(headers=headers)
+            self.__condition.notify_all()
+
+    def throttle(self, headers=None) -> None:
+        """ Hold back all requests after PlentyMarkets rejected a request """
+        decay = get_header_value(headers, LIMIT_HEADERS['short'][1])
+        with self.__condition:
+            self.__pause(seconds=decay if decay else THROTTLE_WAIT)
+            self.concurrency = 1
+            self.__condition.notify_all()
+
+    def __pause(self, seconds: float) -> None:
+        resume_at = time.monotonic() + max(1, seconds)
+        if resume_at > self.resume_at:
+            self.resume_at = resume_at
+
+    def __update(self, headers) -> None:
+        concurrency = None
+        for period, (left_key, decay_key) in LIMIT_HEADERS.items():
+            calls_left = get_header_value(headers, left_key)
+            if calls_left is None:
+                continue
+            if calls_left <= self.reserve:
+                decay = get_header_value(headers, decay_key) or THROTTLE_WAIT
+                logger.warning(f"Only {calls_left} PlentyMarkets calls left "
+                               f"in the {period} period, wait {decay} "
+                               "seconds.")
+                self.__pause(seconds=decay)
+            allowed = min(self.max_workers, max(1, calls_left - self.reserve))
+            concurrency = min(concurrency or allowed, allowed)
+        if concurrency:
+            self.concurrency = concurrency
+
+
+class ScheduledPlentyApi():
+    """
+    Forward all calls to a plenty_api.PlentyApi instance and send every
+    request method (plenty_api_*) through the scheduler.
+
+    plenty_api doesn't expose the response headers, so these requests only
+    occupy a slot, the limits are learned from the requests of the fetch
+    module, which use the same scheduler.
+    """
+    def __init__(self, api, scheduler: RequestScheduler):
+        self.api = api
+        self.scheduler: RequestScheduler = scheduler
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.api, name)
+        if not name.startswith('plenty_api_') or not callable(attribute):
+            return attribute
+
+        def scheduled_request(*args, **kwargs):
+            self.scheduler.acquire()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                self.scheduler.release()
+        return scheduled_request
@@ -26,9 +26,6 @@ call limit. The data could be shared through parameters, but that is ugly.
 """
 
 
-import pandas
-
-
 lang:                           str = ''
 referrer:                       str = ''
 img_match_criteria:            dict = {'type': '', 'value': ''}
@@ -42,5 +39,14 @@ price_id:                       int = 0
 warehouse_id:                   str = ''
 color_attribute_id:             int = 0
 size_attribute_id:              int = 0
-plenty_variations: pandas.DataFrame = None
+# Configured currency and separators of the price column
+price_format:                  dict = {}
+# VariationRecord instances of the referrer
+plenty_variations:             list = None
 plenty_api_instance:         object = None
+reference_cache:             object = None
+# Prefetched items, manufacturers and attributes
+reference_data:                dict = {}
+# plenty.MatchTables of the current run
+match_tables:                object = None
+max_workers:                    int = 1
@@ -0,0 +1,102 @@
+"""
+Local HTTP server imitating the paginated variation route of the
+PlentyMarkets REST API, to measure and test the page requests without a
+live system.
+"""
+import json
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StandInPlentyServer():
+    """
+    Serve a list of variations under /rest/items/variations.
+
+    Every response is delayed by @latency seconds to imitate the network
+    round-trip. The server records the handled requests in @requests and
+    the highest amount of concurrently handled requests in @max_parallel.
+
+    Usage:
+        with StandInPlentyServer(variations=[...]) as server:
+            api.url = server.url
+    """
+    def __init__(self, variations: list, items_per_page: int = 50,
+                 latency: float = 0):
+        self.variations: list = variations
+        self.items_per_page: int = items_per_page
+        self.latency: float = latency
+        self.requests: list = []
+        self.max_parallel: int = 0
+        self.__active: int = 0
+        self.__lock = threading.Lock()
+        self.__server = None
+        self.__thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def page(self, query: dict) -> dict:
+        page = int(query.get('page', ['1'])[0])
+        last_page = max(1, -(-len(self.variations) // self.items_per_page))
+        start = (page - 1) * self.items_per_page
+        return {
+            'page': page,
+            'totalsCount': len(self.variations),
+            'isLastPage': page >= last_page,
+            'lastPageNumber': last_page,
+            'firstOnPage': start + 1,
+            'lastOnPage': min(start + self.items_per_page,
+                              len(self.variations)),
+            'itemsPerPage': self.items_per_page,
+            'entries': self.variations[start:start + self.items_per_page]
+        }
+
+    def handle(self, path: str) -> tuple:
+        """ Return the status code and the body for a GET request """
+        parsed = urllib.parse.urlparse(path)
+        query = urllib.parse.parse_qs(parsed.query)
+        with self.__lock:
+            self.requests.append(query)
+            self.__active += 1
+            self.max_parallel = max(self.max_parallel, self.__active)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if parsed.path != '/rest/items/variations':
+                return (404, {'error': {'message': 'Not found'}})
+            return (200, self.page(query=query))
+        finally:
+            with self.__lock:
+                self.__active -= 1
+
+    def __enter__(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):  # pylint: disable=invalid-name
+                status, body = stand_in.handle(path=self.path)
+                content = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *args):
+                pass
+
+        self.__server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.__thread = threading.Thread(target=self.__server.serve_forever,
+                                         kwargs={'poll_interval': 0.05},
+                                         daemon=True)
+        self.__thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
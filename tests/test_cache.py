@@ -0,0 +1,229 @@
+import json
+import time
+import unittest.mock
+
+from facebook_feed_sync.packages.cache import (
+    ReferenceCache, VariationSnapshot, cached_request
+)
+import facebook_feed_sync.packages.shared_data as shared
+
+
+def describe_reference_cache():
+    def with_empty_cache(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        request = unittest.mock.Mock(return_value=[{'id': 1}])
+
+        result = cache.get(entity='manufacturers', request=request)
+
+        assert result == [{'id': 1}]
+        assert request.call_count == 1
+        assert (tmp_path / 'manufacturers.json').exists()
+
+    def with_stored_response(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        cache.store(entity='attributes', data=[{'id': 2}])
+        request = unittest.mock.Mock(return_value=[{'id': 3}])
+
+        result = cache.get(entity='attributes', request=request)
+
+        assert result == [{'id': 2}]
+        request.assert_not_called()
+
+    def with_expired_response(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path), ttl={'attributes': 10})
+        with open(tmp_path / 'attributes.json', 'w') as cache_file:
+            json.dump({'timestamp': time.time() - 11 * 60,
+                       'data': [{'id': 2}]}, cache_file)
+        request = unittest.mock.Mock(return_value=[{'id': 3}])
+
+        result = cache.get(entity='attributes', request=request)
+
+        assert result == [{'id': 3}]
+        assert cache.load(entity='attributes') == [{'id': 3}]
+
+    def with_key(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        cache.store(entity='items', data=[{'id': 1}], key='de')
+
+        assert cache.load(entity='items', key='de') == [{'id': 1}]
+        assert cache.load(entity='items', key='en') is None
+
+    def with_refresh(tmp_path):
+        ReferenceCache(path=str(tmp_path)).store(entity='items',
+                                                 data=[{'id': 1}])
+        cache = ReferenceCache(path=str(tmp_path), refresh=True)
+        request = unittest.mock.Mock(return_value=[{'id': 4}])
+
+        result = cache.get(entity='items', request=request)
+
+        assert result == [{'id': 4}]
+        assert ReferenceCache(path=str(tmp_path)).load(
+            entity='items') == [{'id': 4}]
+
+    def with_refresh_of_single_request(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        cache.store(entity='manufacturers', data=[{'id': 1}])
+        request = unittest.mock.Mock(return_value=[{'id': 1}, {'id': 2}])
+
+        result = cache.get(entity='manufacturers', request=request,
+                           refresh=True)
+
+        assert result == [{'id': 1}, {'id': 2}]
+        assert cache.load(entity='manufacturers') == [{'id': 1}, {'id': 2}]
+
+    def with_disabled_entity(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path), ttl={'items': 0})
+        request = unittest.mock.Mock(return_value=[{'id': 1}])
+
+        cache.get(entity='items', request=request)
+        cache.get(entity='items', request=request)
+
+        assert request.call_count == 2
+        assert not (tmp_path / 'items.json').exists()
+
+    def with_failed_request(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        request = unittest.mock.Mock(return_value=None)
+
+        result = cache.get(entity='items', request=request)
+
+        assert result is None
+        assert not (tmp_path / 'items.json').exists()
+
+    def with_corrupt_file(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        (tmp_path / 'items.json').write_text('{invalid')
+
+        assert cache.load(entity='items') is None
+
+
+def describe_get_by_id():
+    def with_empty_cache(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        request = unittest.mock.Mock(return_value=[{'id': 1}, {'id': 2}])
+
+        result = cache.get_by_id(entity='items', ids=[1, 2], request=request)
+
+        assert result == [{'id': 1}, {'id': 2}]
+        request.assert_called_once_with([1, 2])
+
+    def with_partially_stored_entries(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        cache.store(entity='items', data=[{'id': 1}], timestamp=1234)
+        cache.ttl['items'] = 10 ** 9
+        request = unittest.mock.Mock(return_value=[{'id': 3}])
+
+        result = cache.get_by_id(entity='items', ids=[3, 1], request=request)
+
+        assert result == [{'id': 3}, {'id': 1}]
+        request.assert_called_once_with([3])
+        # the extended response keeps the age of the stored response
+        assert cache.load_with_timestamp(entity='items')[0] == 1234
+
+    def with_refresh_of_stored_entries(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        cache.store(entity='attributes', data=[{'id': 1, 'values': [1]},
+                                               {'id': 2, 'values': [1]}])
+        request = unittest.mock.Mock(return_value=[{'id': 1,
+                                                    'values': [1, 2]}])
+
+        result = cache.get_by_id(entity='attributes', ids=[1],
+                                 request=request, refresh=True)
+
+        assert result == [{'id': 1, 'values': [1, 2]}]
+        request.assert_called_once_with([1])
+        assert cache.load(entity='attributes') == [
+            {'id': 1, 'values': [1, 2]}, {'id': 2, 'values': [1]}]
+
+    def with_failed_request(tmp_path):
+        cache = ReferenceCache(path=str(tmp_path))
+        request = unittest.mock.Mock(return_value=[])
+
+        assert cache.get_by_id(entity='items', ids=[1],
+                               request=request) == []
+        assert not (tmp_path / 'items.json').exists()
+
+
+def describe_cached_request():
+    def without_cache():
+        shared.reference_cache = None
+        request = unittest.mock.Mock(return_value=[{'id': 1}])
+
+        assert cached_request(entity='items', request=request) == [{'id': 1}]
+        assert request.call_count == 1
+
+    def with_cache(tmp_path):
+        shared.reference_cache = ReferenceCache(path=str(tmp_path))
+        request = unittest.mock.Mock(return_value=[{'id': 1}])
+
+        cached_request(entity='items', request=request)
+        result = cached_request(entity='items', request=request)
+
+        shared.reference_cache = None
+        assert result == [{'id': 1}]
+        assert request.call_count == 1
+
+
+def describe_variation_snapshot():
+    def with_missing_file(tmp_path):
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+
+        assert snapshot.load() is False
+        assert snapshot.expired(interval=60, resources=[], lang='de')
+
+    def with_saved_snapshot(tmp_path):
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+        snapshot.replace(variations=[{'id': 1}], timestamp=time.time(),
+                         resources=['stock'], lang='de')
+        snapshot.save()
+
+        loaded = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+
+        assert loaded.load() is True
+        assert loaded.variations == [{'id': 1}]
+        assert not loaded.expired(interval=60, resources=['stock'],
+                                  lang='de')
+
+    def with_unsaved_watermark(tmp_path):
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+        snapshot.replace(variations=[{'id': 1}], timestamp=100,
+                         resources=[], lang='de')
+        snapshot.save()
+        snapshot.merge(variations=[{'id': 2}], timestamp=200)
+
+        loaded = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+        loaded.load()
+
+        assert loaded.watermark == 100
+        assert loaded.variations == [{'id': 1}]
+
+    def with_expired_full_sync(tmp_path):
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+        snapshot.replace(variations=[], timestamp=time.time() - 61 * 60,
+                         resources=['stock'], lang='de')
+
+        assert snapshot.expired(interval=60, resources=['stock'], lang='de')
+
+    def with_missing_resource(tmp_path):
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+        snapshot.replace(variations=[], timestamp=time.time(),
+                         resources=['stock'], lang='de')
+
+        assert snapshot.expired(interval=60, resources=['stock', 'images'],
+                                lang='de')
+        assert snapshot.expired(interval=60, resources=['stock'], lang='en')
+
+    def with_merge(tmp_path):
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+        snapshot.replace(variations=[{'id': 1, 'number': 'a'},
+                                     {'id': 2, 'number': 'b'}],
+                         timestamp=100, resources=[], lang='de')
+
+        snapshot.merge(variations=[{'id': 2, 'number': 'c'},
+                                   {'id': 3, 'number': 'd'}], timestamp=200)
+
+        assert snapshot.variations == [{'id': 1, 'number': 'a'},
+                                       {'id': 2, 'number': 'c'},
+                                       {'id': 3, 'number': 'd'}]
+        assert snapshot.watermark == 200
+        assert snapshot.full_sync == 100
@@ -0,0 +1,83 @@
+from decimal import Decimal
+import numpy as np
+
+from facebook_feed_sync.packages.records import to_records
+from facebook_feed_sync.packages.columnar import (
+    select_sub_resource_values, clamp_inventory, availability_messages,
+    to_cents, format_prices
+)
+
+
+def describe_select_sub_resource_values():
+    def with_matching_entries():
+        variations = to_records(variations=[
+            {'id': 1, 'stock': [{'warehouseId': 1, 'netStock': 4},
+                       {'warehouseId': 2, 'netStock': 7}]},
+            {'id': 2, 'stock': [{'warehouseId': 2, 'netStock': 3}]},
+            {'id': 3, 'stock': []},
+            {'id': 4, 'stock': [{'warehouseId': 2, 'netStock': 1},
+                                {'warehouseId': 2, 'netStock': -2}]}
+        ])
+
+        result = select_sub_resource_values(
+            variations=variations, resource='stock', target=2)
+
+        assert result.tolist() == [7, 3, 0, -2]
+
+    def without_matching_entries():
+        variations = to_records(variations=[
+            {'id': 1, 'stock': [{'warehouseId': 1, 'netStock': 4}]},
+            {'id': 2, 'stock': []}
+        ])
+
+        result = select_sub_resource_values(
+            variations=variations, resource='stock', target=2)
+
+        assert result.tolist() == [0, 0]
+
+
+def describe_clamp_inventory():
+    def with_negative_stock():
+        assert clamp_inventory(stock=np.array([5, 0, -3])) == ['5', '0', '0']
+
+
+def describe_availability_messages():
+    def with_stock():
+        result = availability_messages(stock=np.array([5, 0, -3]))
+
+        assert result == ['in stock', 'out of stock', 'out of stock']
+
+
+def describe_to_cents():
+    def with_float_prices():
+        result = to_cents(prices=np.array([1.5, 12.0, 0.99, 129.9, 25.7,
+                                           0.285, 19.99]))
+
+        assert result.tolist() == [150, 1200, 99, 12990, 2570, 29, 1999]
+
+    def with_integer_prices():
+        assert to_cents(prices=np.array([3, 12])).tolist() == [300, 1200]
+
+    def with_decimal_prices():
+        result = to_cents(prices=np.array([Decimal('25.70'), Decimal('0.285'),
+                                           Decimal('-1.5')], dtype=object))
+
+        assert result.tolist() == [2570, 29, -150]
+
+
+def describe_format_prices():
+    def with_default_format():
+        result = format_prices(cents=np.array([150, 1200, 99, 12990, 2570]))
+
+        assert result == ['1,50 EUR', '12,00 EUR', '0,99 EUR', '129,90 EUR',
+                          '25,70 EUR']
+
+    def with_custom_format():
+        result = format_prices(cents=np.array([123456789, 5, -1050]),
+                               currency='USD', decimal_separator='.',
+                               thousands_separator=',')
+
+        assert result == ['1,234,567.89 USD', '0.05 USD', '-10.50 USD']
+
+    def without_prices():
+        assert format_prices(cents=np.zeros(0, dtype=np.int64)) == []
@@ -0,0 +1,307 @@
+import threading
+import time
+import unittest.mock
+import pytest
+import plenty_api
+
+from facebook_feed_sync.packages import fetch
+from facebook_feed_sync.packages.cache import VariationSnapshot
+
+from tests.stand_in_server import StandInPlentyServer
+
+
+def page_response(entries: list, page: int, last_page: int):
+    response = unittest.mock.Mock()
+    response.status_code = 200
+    response.json.return_value = {
+        'page': page, 'lastPageNumber': last_page,
+        'isLastPage': page == last_page, 'entries': entries
+    }
+    return response
+
+
+@pytest.fixture
+def mock_api():
+    api = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+    api.url = 'https://test.plentymarkets-cloud01.com'
+    api.creds = {'Authorization': 'Bearer token'}
+    return api
+
+
+def describe_request_all_pages():
+    def with_multiple_pages(mock_api, mocker):
+        get = mocker.patch('requests.get', side_effect=[
+            page_response(entries=[{'id': 1}], page=1, last_page=2),
+            page_response(entries=[{'id': 2}], page=2, last_page=2)
+        ])
+
+        result = fetch.request_all_pages(api=mock_api,
+                                         route=fetch.VARIATION_ROUTE,
+                                         query={'with': 'stock'})
+
+        assert result == [{'id': 1}, {'id': 2}]
+        assert get.call_args_list[1][1]['params'] == {'with': 'stock',
+                                                      'page': 2}
+
+    def with_error_response(mock_api, mocker):
+        response = unittest.mock.Mock()
+        response.status_code = 401
+        response.json.return_value = {'error': {'message': 'Unauthorized'}}
+        mocker.patch('requests.get', return_value=response)
+
+        result = fetch.request_all_pages(api=mock_api,
+                                         route=fetch.VARIATION_ROUTE,
+                                         query={})
+
+        assert result is None
+
+
+def describe_request_all_pages_stand_in_server():
+    @pytest.fixture
+    def stand_in_variations() -> list:
+        return [{'id': i, 'number': f'{i}x'} for i in range(1, 24)]
+
+    def with_single_worker(stand_in_variations):
+        with StandInPlentyServer(variations=stand_in_variations,
+                                 items_per_page=5) as server:
+            api = unittest.mock.Mock(url=server.url, creds={})
+            result = fetch.request_all_pages(
+                api=api, route=fetch.VARIATION_ROUTE, query={}, workers=1)
+
+        assert result == stand_in_variations
+        assert server.max_parallel == 1
+
+    def with_multiple_workers(stand_in_variations):
+        with StandInPlentyServer(variations=stand_in_variations,
+                                 items_per_page=5, latency=0.05) as server:
+            api = unittest.mock.Mock(url=server.url, creds={})
+            result = fetch.request_all_pages(
+                api=api, route=fetch.VARIATION_ROUTE,
+                query={'with': 'stock'}, workers=4)
+
+        assert result == stand_in_variations
+        assert len(server.requests) == 5
+        assert all(query['with'] == ['stock'] for query in server.requests)
+        assert server.max_parallel > 1
+
+    def with_single_page(stand_in_variations):
+        with StandInPlentyServer(variations=stand_in_variations,
+                                 items_per_page=50) as server:
+            api = unittest.mock.Mock(url=server.url, creds={})
+            result = fetch.request_all_pages(
+                api=api, route=fetch.VARIATION_ROUTE, query={}, workers=4)
+
+        assert result == stand_in_variations
+        assert len(server.requests) == 1
+
+    def with_invalid_route(stand_in_variations):
+        with StandInPlentyServer(variations=stand_in_variations) as server:
+            api = unittest.mock.Mock(url=server.url, creds={})
+            result = fetch.request_all_pages(api=api, route='/rest/invalid',
+                                             query={}, workers=4)
+
+        assert result is None
+
+
+def describe_get_variations():
+    def with_single_worker(mock_api):
+        variations = [{'id': i} for i in range(1, 6)]
+        with StandInPlentyServer(variations=variations,
+                                 items_per_page=2) as server:
+            mock_api.url = server.url
+            result = fetch.get_variations(api=mock_api,
+                                          refine={'isActive': True},
+                                          additional=['stock'], lang='de')
+
+        assert result == variations
+        assert len(server.requests) == 3
+        assert server.requests[0]['with'] == ['stock']
+        assert server.max_parallel == 1
+        mock_api.plenty_api_get_variations.assert_not_called()
+
+    def with_multiple_workers(mock_api):
+        variations = [{'id': i} for i in range(1, 12)]
+        with StandInPlentyServer(variations=variations,
+                                 items_per_page=2) as server:
+            mock_api.url = server.url
+            result = fetch.get_variations(api=mock_api,
+                                          refine={'referrerId': 4},
+                                          additional=['stock', 'images'],
+                                          lang='DE', workers=3)
+
+        assert result == variations
+        assert server.requests[0]['with'] == ['stock,images']
+        assert server.requests[0]['referrerId'] == ['4']
+        assert server.requests[0]['lang'] == ['de']
+        mock_api.plenty_api_get_variations.assert_not_called()
+
+
+def describe_get_items():
+    def with_item_ids(mock_api, mocker):
+        get = mocker.patch('requests.get', return_value=page_response(
+            entries=[{'id': 1}, {'id': 2}], page=1, last_page=1))
+
+        result = fetch.get_items(api=mock_api, refine={'id': '1,2'},
+                                 additional=['itemProperties'], lang='DE')
+
+        assert result == [{'id': 1}, {'id': 2}]
+        assert get.call_args[0][0] == mock_api.url + fetch.ITEM_ROUTE
+        assert get.call_args[1]['params'] == {
+            'id': '1,2', 'with': 'itemProperties', 'lang': 'de', 'page': 1}
+        mock_api.plenty_api_get_items.assert_not_called()
+
+    def with_error_response(mock_api, mocker):
+        response = unittest.mock.Mock()
+        response.status_code = 401
+        response.json.return_value = {'error': {'message': 'Unauthorized'}}
+        mocker.patch('requests.get', return_value=response)
+
+        result = fetch.get_items(api=mock_api, refine={'id': '1'})
+
+        assert result is None
+
+
+def describe_get_variations_since():
+    def with_changes(mock_api, mocker):
+        get = mocker.patch('requests.get', side_effect=[
+            page_response(entries=[{'id': 1}, {'id': 2}], page=1,
+                          last_page=1),
+            page_response(entries=[{'id': 2}, {'id': 3}], page=1,
+                          last_page=1)
+        ])
+
+        result = fetch.get_variations_since(
+            api=mock_api, since=1000.5, refine={'referrerId': 4},
+            additional=['stock'], lang='DE')
+
+        assert sorted(var['id'] for var in result) == [1, 2, 3]
+        params = get.call_args_list[0][1]['params']
+        assert params['updatedBetween'] == 1000
+        assert params['referrerId'] == 4
+        assert params['with'] == 'stock'
+        assert params['lang'] == 'de'
+        assert get.call_args_list[1][1]['params'][
+            'relatedUpdatedBetween'] == 1000
+
+
+def describe_get_attributes():
+    def with_configured_attributes(mock_api, mocker):
+        responses = []
+        for attribute_id in [2, 3]:
+            response = unittest.mock.Mock()
+            response.status_code = 200
+            response.json.return_value = {'id': attribute_id, 'values': []}
+            responses.append(response)
+        get = mocker.patch('requests.get', side_effect=responses)
+
+        result = fetch.get_attributes(api=mock_api, attribute_ids=[2, 3])
+
+        assert [attribute['id'] for attribute in result] == [2, 3]
+        assert get.call_args_list[1][0][0] ==\
+            mock_api.url + fetch.ATTRIBUTE_ROUTE + '/3'
+        assert get.call_args_list[1][1]['params'] == {'with': 'values'}
+
+    def with_error_response(mock_api, mocker):
+        response = unittest.mock.Mock()
+        response.status_code = 404
+        response.json.return_value = {'error': {'message': 'Not found'}}
+        mocker.patch('requests.get', return_value=response)
+
+        result = fetch.get_attributes(api=mock_api, attribute_ids=[2])
+
+        assert result is None
+
+
+def describe_get_variations_incremental():
+    def without_snapshot(mock_api, tmp_path, mocker):
+        get = mocker.patch('requests.get', return_value=page_response(
+            entries=[{'id': 1}], page=1, last_page=1))
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+
+        result = fetch.get_variations_incremental(
+            api=mock_api, snapshot=snapshot, interval=60,
+            additional=['stock'], lang='de')
+
+        assert result == [{'id': 1}]
+        assert snapshot.resources == ['stock']
+        get.assert_called_once()
+
+    def with_valid_snapshot(mock_api, tmp_path, mocker):
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+        snapshot.replace(variations=[{'id': 1, 'number': 'a'}],
+                         timestamp=time.time(), resources=['stock'],
+                         lang='de')
+        snapshot.save()
+        mocker.patch('requests.get', side_effect=[
+            page_response(entries=[{'id': 1, 'number': 'b'}], page=1,
+                          last_page=1),
+            page_response(entries=[], page=1, last_page=1)
+        ])
+
+        result = fetch.get_variations_incremental(
+            api=mock_api, snapshot=VariationSnapshot(
+                path=str(tmp_path / 'snap.json')),
+            interval=60, additional=['stock'], lang='de')
+
+        assert result == [{'id': 1, 'number': 'b'}]
+        mock_api.plenty_api_get_variations.assert_not_called()
+
+    def with_refresh(mock_api, tmp_path, mocker):
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+        snapshot.replace(variations=[{'id': 1}], timestamp=time.time(),
+                         resources=['stock'], lang='de')
+        snapshot.save()
+        get = mocker.patch('requests.get', return_value=page_response(
+            entries=[{'id': 2}], page=1, last_page=1))
+
+        result = fetch.get_variations_incremental(
+            api=mock_api, snapshot=snapshot, interval=60,
+            additional=['stock'], lang='de', refresh=True)
+
+        assert result == [{'id': 2}]
+        assert 'updatedBetween' not in get.call_args[1]['params']
+
+    def with_failed_update(mock_api, tmp_path, mocker):
+        snapshot = VariationSnapshot(path=str(tmp_path / 'snap.json'))
+        snapshot.replace(variations=[{'id': 1}], timestamp=time.time(),
+                         resources=['stock'], lang='de')
+        snapshot.save()
+        mocker.patch('requests.get',
+                     side_effect=fetch.requests.ConnectionError('offline'))
+
+        result = fetch.get_variations_incremental(
+            api=mock_api, snapshot=snapshot, interval=60,
+            additional=['stock'], lang='de')
+
+        assert result == []
+
+
+def describe_run_parallel():
+    def with_single_worker():
+        order = []
+        tasks = {'a': lambda: order.append('a') or 1,
+                 'b': lambda: order.append('b') or 2}
+
+        result = fetch.run_parallel(tasks=tasks, workers=1)
+
+        assert result == {'a': 1, 'b': 2}
+        assert order == ['a', 'b']
+
+    def with_multiple_workers():
+        # Both tasks have to run at the same time to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+        tasks = {'a': lambda: barrier.wait() is not None and 'a',
+                 'b': lambda: barrier.wait() is not None and 'b'}
+
+        result = fetch.run_parallel(tasks=tasks, workers=2)
+
+        assert result == {'a': 'a', 'b': 'b'}
+
+    def with_failed_task():
+        def fail():
+            raise fetch.requests.ConnectionError('offline')
+        tasks = {'items': fail, 'attributes': lambda: [{'id': 1}]}
+
+        result = fetch.run_parallel(tasks=tasks, workers=2)
+
+        assert result == {'items': None, 'attributes': [{'id': 1}]}
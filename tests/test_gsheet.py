@@ -1,10 +1,15 @@
+import unittest.mock
 import pytest
 from pytest_mock import mocker
+import gspread
+import numpy as np
 import pandas
 from pandas.testing import assert_frame_equal
 
 from facebook_feed_sync.packages.gsheet import (
-    add_new_items, delete_removed_items, update_column, GSHEET_HEADER
+    add_new_items, delete_removed_items, update_column, GSHEET_HEADER,
+    gsheet_read, get_row_ranges, gsheet_write, get_changed_ranges,
+    parse_sheet_values
 )
 
 
@@ -582,3 +587,252 @@ def describe_update_column():
 
         # should be unchanged
         assert_frame_equal(sample_google_sheet_normal, result)
+
+
+def describe_get_row_ranges():
+    def with_contiguous_rows():
+        result = get_row_ranges(rows=[7, 2, 3, 4, 9, 8, 12])
+
+        assert result == [(12, 13), (7, 10), (2, 5)]
+
+    def without_rows():
+        assert get_row_ranges(rows=[]) == []
+
+
+def describe_gsheet_read():
+    @pytest.fixture
+    def worksheet():
+        sheet = unittest.mock.Mock(spec=gspread.Worksheet)
+        sheet.id = 0
+        sheet.spreadsheet = unittest.mock.Mock()
+        return sheet
+
+    def with_rows_without_id(worksheet):
+        rows = [[''] * len(GSHEET_HEADER) for _ in range(6)]
+        for index in [0, 3, 5]:
+            rows[index][0] = str(index)
+        worksheet.get_all_values.return_value = [list(GSHEET_HEADER)] + rows
+
+        result = gsheet_read(worksheet=worksheet)
+
+        assert result['id'].tolist() == ['0', '3', '5']
+        worksheet.delete_rows.assert_not_called()
+        worksheet.spreadsheet.batch_update.assert_called_once_with(
+            {'requests': [
+                {'deleteDimension': {'range': {
+                    'sheetId': 0, 'dimension': 'ROWS',
+                    'startIndex': 5, 'endIndex': 6}}},
+                {'deleteDimension': {'range': {
+                    'sheetId': 0, 'dimension': 'ROWS',
+                    'startIndex': 2, 'endIndex': 4}}}
+            ]})
+
+    def with_needed_columns(worksheet):
+        worksheet.batch_get.return_value = [
+            [[name] for name in GSHEET_HEADER],
+            [['1234', '', '1236']],
+            [['15', '3', '0', '8']]
+        ]
+
+        result = gsheet_read(worksheet=worksheet, columns=['inventory'])
+
+        worksheet.batch_get.assert_called_once_with(
+            ['1:1', 'A2:A', 'E2:E'], major_dimension='COLUMNS')
+        worksheet.get_all_values.assert_not_called()
+        assert result.to_dict(orient='list') == {
+            'id': ['1234', '1236'], 'inventory': ['15', '0']}
+        assert result.attrs['sheet_header'] == GSHEET_HEADER
+        worksheet.spreadsheet.batch_update.assert_called_once_with(
+            {'requests': [
+                {'deleteDimension': {'range': {
+                    'sheetId': 0, 'dimension': 'ROWS',
+                    'startIndex': 4, 'endIndex': 5}}},
+                {'deleteDimension': {'range': {
+                    'sheetId': 0, 'dimension': 'ROWS',
+                    'startIndex': 2, 'endIndex': 3}}}
+            ]})
+
+    def with_unexpected_header(worksheet):
+        worksheet.batch_get.return_value = [
+            [['id'], ['inventory']], [['1234']], [['15']]]
+        worksheet.get_all_values.return_value = [['id', 'inventory'],
+                                                 ['1234', '15']]
+
+        result = gsheet_read(worksheet=worksheet, columns=['inventory'])
+
+        assert result.to_dict(orient='list') == {'id': ['1234'],
+                                                 'inventory': ['15']}
+        assert 'sheet_header' not in result.attrs
+
+    def with_complete_rows(worksheet):
+        rows = [[''] * len(GSHEET_HEADER) for _ in range(2)]
+        rows[0][0] = '1234'
+        rows[1][0] = '1235'
+        worksheet.get_all_values.return_value = [list(GSHEET_HEADER)] + rows
+
+        result = gsheet_read(worksheet=worksheet)
+
+        assert result['id'].tolist() == ['1234', '1235']
+        worksheet.spreadsheet.batch_update.assert_not_called()
+
+
+def describe_parse_sheet_values():
+    def with_sheet_values():
+        values = [list(GSHEET_HEADER),
+                  ['1234'] + ['a'] * (len(GSHEET_HEADER) - 1),
+                  ['1235', '0015']]
+
+        result = parse_sheet_values(values=values)
+
+        assert list(result.columns) == GSHEET_HEADER
+        assert result['id'].tolist() == ['1234', '1235']
+        assert result['title'].tolist() == ['a', '0015']
+        assert result['shipping_weight'].tolist() == ['a', '']
+
+    def with_header_only():
+        result = parse_sheet_values(values=[list(GSHEET_HEADER)])
+
+        assert list(result.columns) == GSHEET_HEADER
+        assert len(result.index) == 0
+
+    def with_duplicate_header():
+        with pytest.raises(gspread.exceptions.GSpreadException):
+            parse_sheet_values(values=[['id', 'id'], ['1', '2']])
+
+    def without_values():
+        assert parse_sheet_values(values=[]).empty
+
+
+def describe_get_changed_ranges():
+    def with_changed_cells():
+        changed = np.array([
+            [False, True, True, False, True],
+            [False, True, True, False, False],
+            [False, False, False, False, False],
+            [False, True, True, False, False],
+            [True, True, True, True, True]
+        ])
+
+        result = get_changed_ranges(changed=changed)
+
+        assert result == [(0, 1, 1, 2), (0, 0, 4, 4), (3, 3, 1, 2),
+                          (4, 4, 0, 4)]
+
+    def without_changes():
+        assert get_changed_ranges(changed=np.zeros((3, 2), dtype=bool)) ==\
+            []
+
+
+def describe_gsheet_write():
+    @pytest.fixture
+    def worksheet():
+        return unittest.mock.Mock(spec=gspread.Worksheet)
+
+    @pytest.fixture
+    def original() -> pandas.DataFrame:
+        return pandas.DataFrame(
+            [[str(1000 + row), str(row), 'new', ''] for row in range(10)],
+            columns=['id', 'inventory', 'condition', 'sale_price'])
+
+    def with_few_changes(worksheet, original, mocker):
+        full_write = mocker.patch('gspread_dataframe.set_with_dataframe')
+        updated = original.copy()
+        updated.loc[3, 'inventory'] = '15'
+        updated.loc[4, 'inventory'] = '0'
+        updated = pandas.concat([updated, pandas.DataFrame(
+            [['2000', '1', 'new', '']], columns=updated.columns)],
+            ignore_index=True)
+
+        gsheet_write(worksheet=worksheet, dataframe=updated,
+                     original=original)
+
+        full_write.assert_not_called()
+        worksheet.batch_update.assert_called_once_with(
+            [{'range': 'B5:B6', 'values': [['15'], ['0']]},
+             {'range': 'A12:D12', 'values': [['2000', '1', 'new', '']]}],
+            value_input_option='USER_ENTERED')
+
+    def with_many_changes(worksheet, original, mocker):
+        full_write = mocker.patch('gspread_dataframe.set_with_dataframe')
+        updated = original.copy()
+        updated['inventory'] = '0'
+        updated['condition'] = 'used'
+
+        gsheet_write(worksheet=worksheet, dataframe=updated,
+                     original=original)
+
+        full_write.assert_called_once_with(worksheet, updated)
+        worksheet.batch_update.assert_not_called()
+
+    def with_synchronized_columns(worksheet, original, mocker):
+        full_write = mocker.patch('gspread_dataframe.set_with_dataframe')
+        worksheet.id = 0
+        worksheet.spreadsheet = unittest.mock.Mock()
+        updated = original.drop(index=[2, 3]).reset_index(drop=True)
+        updated['inventory'] = '7'
+        updated = pandas.concat([updated, pandas.DataFrame(
+            [['2000', '1', 'new', '']], columns=updated.columns)],
+            ignore_index=True)
+
+        gsheet_write(worksheet=worksheet, dataframe=updated,
+                     original=original, columns=['inventory'])
+
+        full_write.assert_not_called()
+        worksheet.spreadsheet.batch_update.assert_called_once_with(
+            {'requests': [{'deleteDimension': {'range': {
+                'sheetId': 0, 'dimension': 'ROWS',
+                'startIndex': 3, 'endIndex': 5}}}]})
+        worksheet.batch_update.assert_called_once_with(
+            [{'range': 'B2:B9', 'values': [['7']] * 8},
+             {'range': 'A10:D10', 'values': [['2000', '1', 'new', '']]}],
+            value_input_option='USER_ENTERED')
+
+    def with_moved_rows(worksheet, original, mocker):
+        full_write = mocker.patch('gspread_dataframe.set_with_dataframe')
+        updated = original.iloc[::-1].reset_index(drop=True)
+
+        gsheet_write(worksheet=worksheet, dataframe=updated,
+                     original=original, columns=['inventory'])
+
+        full_write.assert_called_once_with(worksheet, updated)
+        worksheet.batch_update.assert_not_called()
+
+    def with_partially_read_sheet(worksheet, mocker):
+        full_write = mocker.patch('gspread_dataframe.set_with_dataframe')
+        original = pandas.DataFrame({'id': ['1234', '1235'],
+                                     'inventory': ['1', '2']})
+        original.attrs['sheet_header'] = list(GSHEET_HEADER)
+        new_row = dict.fromkeys(GSHEET_HEADER, 'x')
+        updated = pandas.concat([
+            pandas.DataFrame({'id': ['1234', '1235'],
+                              'inventory': ['3', '2']}),
+            pandas.DataFrame([new_row])], ignore_index=True)
+
+        gsheet_write(worksheet=worksheet, dataframe=updated,
+                     original=original, columns=['inventory'])
+
+        full_write.assert_not_called()
+        worksheet.batch_update.assert_called_once_with(
+            [{'range': 'E2:E3', 'values': [['3'], ['2']]},
+             {'range': 'A4:W4', 'values': [['x'] * len(GSHEET_HEADER)]}],
+            value_input_option='USER_ENTERED')
+
+    def with_moved_rows_of_partially_read_sheet(worksheet, mocker):
+        full_write = mocker.patch('gspread_dataframe.set_with_dataframe')
+        original = pandas.DataFrame({'id': ['1234', '1235'],
+                                     'inventory': ['1', '2']})
+        original.attrs['sheet_header'] = list(GSHEET_HEADER)
+        updated = original.iloc[::-1].reset_index(drop=True)
+
+        gsheet_write(worksheet=worksheet, dataframe=updated,
+                     original=original, columns=['inventory'])
+
+        full_write.assert_not_called()
+        worksheet.batch_update.assert_not_called()
+
+    def without_original(worksheet, original, mocker):
+        full_write = mocker.patch('gspread_dataframe.set_with_dataframe')
+
+        gsheet_write(worksheet=worksheet, dataframe=original)
+
+        full_write.assert_called_once_with(worksheet, original)
@@ -5,7 +5,12 @@ from pandas.testing import assert_frame_equal
 import plenty_api
 
 
-from facebook_feed_sync.packages.plenty import get_data_from_plentymarkets
+from facebook_feed_sync.packages.plenty import (
+    get_data_from_plentymarkets, get_variation_resources, ColumnValuesFiller
+)
+import facebook_feed_sync.packages.plenty as plenty
+from facebook_feed_sync.packages.cache import ReferenceCache
+from facebook_feed_sync.packages.records import VariationRecord
 from facebook_feed_sync.packages.gsheet import GSHEET_HEADER
 import facebook_feed_sync.packages.shared_data as shared
 
@@ -558,6 +563,12 @@ def mock_plenty_api_items_response_en(
     return resp
 
 
+@pytest.fixture
+def mock_get_items(mocker):
+    """ Replace the item requests, which don't use the plenty_api methods """
+    return mocker.patch.object(plenty.fetch, 'get_items')
+
+
 @pytest.fixture
 def mock_plenty_api_attribute_response() -> list:
     response = [
@@ -868,13 +879,13 @@ def describe_get_data_from_plentymarkets() -> None:
 
     def with_sync_type_text(sample_variations: list,
                             expected_get_data_from_pm: dict,
-                            mock_plenty_api_items_response_de: list):
+                            mock_plenty_api_items_response_de: list,
+                            mock_get_items):
         shared.plenty_variations = sample_variations
         shared.lang = 'de'
         shared.item_name_number = 3
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_items.return_value =\
-            mock_plenty_api_items_response_de
+        mock_get_items.return_value = mock_plenty_api_items_response_de
         shared.plenty_api_instance = mock_plenty
         header = ['id', 'title', 'description']
 
@@ -885,13 +896,13 @@ def describe_get_data_from_plentymarkets() -> None:
 
     def with_sync_type_text_en(sample_variations: list,
                                expected_get_data_from_pm: dict,
-                               mock_plenty_api_items_response_en: list):
+                               mock_plenty_api_items_response_en: list,
+                               mock_get_items):
         shared.plenty_variations = sample_variations
         shared.lang = 'en'
         shared.item_name_number = 3
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_items.return_value =\
-            mock_plenty_api_items_response_en
+        mock_get_items.return_value = mock_plenty_api_items_response_en
         shared.plenty_api_instance = mock_plenty
         header = ['id', 'title', 'description']
 
@@ -902,13 +913,13 @@ def describe_get_data_from_plentymarkets() -> None:
 
     def with_sync_type_text_it(sample_variations: list,
                                expected_get_data_from_pm: dict,
-                               mock_plenty_api_items_response_en: list):
+                               mock_plenty_api_items_response_en: list,
+                               mock_get_items):
         shared.plenty_variations = sample_variations
         shared.lang = 'it'
         shared.item_name_number = 3
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_items.return_value =\
-            mock_plenty_api_items_response_en
+        mock_get_items.return_value = mock_plenty_api_items_response_en
         shared.plenty_api_instance = mock_plenty
         header = ['id', 'title', 'description']
 
@@ -919,14 +930,15 @@ def describe_get_data_from_plentymarkets() -> None:
 
     def with_sync_type_attribute(sample_variations: list,
                                  expected_get_data_from_pm: dict,
-                                 mock_plenty_api_attribute_response: list):
+                                 mock_plenty_api_attribute_response: list,
+                                 mocker):
         shared.plenty_variations = sample_variations
         shared.lang = 'de'
         shared.color_attribute_id = 2
         shared.size_attribute_id = 3
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_attributes.return_value =\
-            mock_plenty_api_attribute_response
+        mocker.patch.object(plenty, 'get_attributes',
+                            return_value=mock_plenty_api_attribute_response)
         shared.plenty_api_instance = mock_plenty
         header = ['id', 'color', 'size']
 
@@ -937,14 +949,15 @@ def describe_get_data_from_plentymarkets() -> None:
 
     def with_sync_type_attribute_en(sample_variations: list,
                                     expected_get_data_from_pm: dict,
-                                    mock_plenty_api_attribute_response: list):
+                                    mock_plenty_api_attribute_response: list,
+                                    mocker):
         shared.plenty_variations = sample_variations
         shared.lang = 'en'
         shared.color_attribute_id = 2
         shared.size_attribute_id = 3
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_attributes.return_value =\
-            mock_plenty_api_attribute_response
+        mocker.patch.object(plenty, 'get_attributes',
+                            return_value=mock_plenty_api_attribute_response)
         shared.plenty_api_instance = mock_plenty
         header = ['id', 'color', 'size']
 
@@ -955,14 +968,15 @@ def describe_get_data_from_plentymarkets() -> None:
 
     def with_sync_type_attribute_it(sample_variations: list,
                                     expected_get_data_from_pm: dict,
-                                    mock_plenty_api_attribute_response: list):
+                                    mock_plenty_api_attribute_response: list,
+                                    mocker):
         shared.plenty_variations = sample_variations
         shared.lang = 'it'
         shared.color_attribute_id = 2
         shared.size_attribute_id = 3
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_attributes.return_value =\
-            mock_plenty_api_attribute_response
+        mocker.patch.object(plenty, 'get_attributes',
+                            return_value=mock_plenty_api_attribute_response)
         shared.plenty_api_instance = mock_plenty
         header = ['id', 'color', 'size']
 
@@ -1000,7 +1014,8 @@ def describe_get_data_from_plentymarkets() -> None:
                           expected_get_data_from_pm: dict,
                           mock_plenty_api_items_response_de: list,
                           mock_plenty_api_attribute_response: list,
-                          mock_plenty_api_manufacturers_response: list):
+                          mock_plenty_api_manufacturers_response: list,
+                          mocker, mock_get_items):
         shared.plenty_variations = sample_variations
         shared.lang = 'de'
         shared.item_name_number = 3
@@ -1011,10 +1026,9 @@ def describe_get_data_from_plentymarkets() -> None:
         shared.material_property_id = 3
 
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_items.return_value =\
-            mock_plenty_api_items_response_de
-        mock_plenty.plenty_api_get_attributes.return_value =\
-            mock_plenty_api_attribute_response
+        mock_get_items.return_value = mock_plenty_api_items_response_de
+        mocker.patch.object(plenty, 'get_attributes',
+                            return_value=mock_plenty_api_attribute_response)
         mock_plenty.plenty_api_get_manufacturers.return_value =\
             mock_plenty_api_manufacturers_response
         shared.plenty_api_instance = mock_plenty
@@ -1029,7 +1043,8 @@ def describe_get_data_from_plentymarkets() -> None:
                            expected_get_data_from_pm: dict,
                            mock_plenty_api_items_response_de: list,
                            mock_plenty_api_attribute_response: list,
-                           mock_plenty_api_manufacturers_response: list):
+                           mock_plenty_api_manufacturers_response: list,
+                           mocker, mock_get_items):
         shared.plenty_variations = sample_variations
         shared.lang = 'de'
         shared.item_name_number = 3
@@ -1040,10 +1055,9 @@ def describe_get_data_from_plentymarkets() -> None:
         shared.material_property_id = 3
 
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_items.return_value =\
-            mock_plenty_api_items_response_de
-        mock_plenty.plenty_api_get_attributes.return_value =\
-            mock_plenty_api_attribute_response
+        mock_get_items.return_value = mock_plenty_api_items_response_de
+        mocker.patch.object(plenty, 'get_attributes',
+                            return_value=mock_plenty_api_attribute_response)
         mock_plenty.plenty_api_get_manufacturers.return_value =\
             mock_plenty_api_manufacturers_response
         shared.plenty_api_instance = mock_plenty
@@ -1058,7 +1072,8 @@ def describe_get_data_from_plentymarkets() -> None:
                               expected_get_data_from_pm: dict,
                               mock_plenty_api_items_response_en: list,
                               mock_plenty_api_attribute_response: list,
-                              mock_plenty_api_manufacturers_response: list):
+                              mock_plenty_api_manufacturers_response: list,
+                              mocker, mock_get_items):
         shared.plenty_variations = sample_variations
         shared.lang = 'en'
         shared.item_name_number = 3
@@ -1069,10 +1084,9 @@ def describe_get_data_from_plentymarkets() -> None:
         shared.material_property_id = 3
 
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_items.return_value =\
-            mock_plenty_api_items_response_en
-        mock_plenty.plenty_api_get_attributes.return_value =\
-            mock_plenty_api_attribute_response
+        mock_get_items.return_value = mock_plenty_api_items_response_en
+        mocker.patch.object(plenty, 'get_attributes',
+                            return_value=mock_plenty_api_attribute_response)
         mock_plenty.plenty_api_get_manufacturers.return_value =\
             mock_plenty_api_manufacturers_response
         shared.plenty_api_instance = mock_plenty
@@ -1087,7 +1101,8 @@ def describe_get_data_from_plentymarkets() -> None:
                                  expected_get_data_from_pm: dict,
                                  mock_plenty_api_items_response_de: list,
                                  mock_plenty_api_attribute_response: list,
-                                 mock_plenty_api_manufacturers_response: list):
+                                 mock_plenty_api_manufacturers_response: list,
+                                 mocker, mock_get_items):
         shared.plenty_variations = sample_variations
         shared.lang = 'de'
         shared.item_name_number = 3
@@ -1098,10 +1113,9 @@ def describe_get_data_from_plentymarkets() -> None:
         shared.material_property_id = 3
 
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_items.return_value =\
-            mock_plenty_api_items_response_de
-        mock_plenty.plenty_api_get_attributes.return_value =\
-            mock_plenty_api_attribute_response
+        mock_get_items.return_value = mock_plenty_api_items_response_de
+        mocker.patch.object(plenty, 'get_attributes',
+                            return_value=mock_plenty_api_attribute_response)
         mock_plenty.plenty_api_get_manufacturers.return_value =\
             mock_plenty_api_manufacturers_response
         shared.plenty_api_instance = mock_plenty
@@ -1116,7 +1130,8 @@ def describe_get_data_from_plentymarkets() -> None:
                        expected_get_data_from_pm: dict,
                        mock_plenty_api_items_response_de: list,
                        mock_plenty_api_attribute_response: list,
-                       mock_plenty_api_manufacturers_response: list):
+                       mock_plenty_api_manufacturers_response: list,
+                       mocker, mock_get_items):
         shared.plenty_variations = sample_variations
         shared.lang = 'de'
         shared.gender_property_id = 3
@@ -1126,8 +1141,9 @@ def describe_get_data_from_plentymarkets() -> None:
         shared.material_property_id = 3
 
         mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
-        mock_plenty.plenty_api_get_items.return_value = []
-        mock_plenty.plenty_api_get_attributes.return_value = []
+        mock_get_items.return_value = []
+        mocker.patch.object(plenty, 'get_attributes',
+                            return_value=[])
         mock_plenty.plenty_api_get_manufacturers.return_value = []
         shared.plenty_api_instance = mock_plenty
         target = ['1234x']
@@ -1136,3 +1152,567 @@ def describe_get_data_from_plentymarkets() -> None:
 
         assert_frame_equal(expected_get_data_from_pm['api_error'],
                            result)
+
+
+def describe_get_variation_resources() -> None:
+    def with_sync_type_inventory():
+        result = get_variation_resources(header=['inventory'])
+
+        assert result == ['stock']
+
+    def with_sync_type_text():
+        result = get_variation_resources(header=['id', 'title',
+                                                 'description'])
+
+        assert result == []
+
+    def with_shared_resources():
+        result = get_variation_resources(header=['link', 'material',
+                                                 'color', 'size'])
+
+        assert result == ['properties', 'variationAttributeValues']
+
+    def with_full_header():
+        result = get_variation_resources(header=GSHEET_HEADER)
+
+        assert sorted(result) == sorted(['properties', 'images',
+                                         'variationAttributeValues', 'stock',
+                                         'variationSalesPrices'])
+
+
+def describe_get_items() -> None:
+    def with_referrer_items(sample_variations: list,
+                            mock_plenty_api_items_response_de: list,
+                            mock_get_items):
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.return_value = mock_plenty_api_items_response_de
+        shared.plenty_api_instance = mock_plenty
+
+        ColumnValuesFiller(variations=sample_variations[:1],
+                           header=['id', 'title'])
+
+        mock_get_items.assert_called_once_with(
+            api=mock_plenty, refine={'id': '1,2,3,4'},
+            additional=['itemProperties'], lang='de')
+
+    def with_multiple_batches(sample_variations: list,
+                              mock_plenty_api_items_response_de: list,
+                              monkeypatch, mock_get_items):
+        monkeypatch.setattr(plenty, 'ITEM_ID_BATCH_SIZE', 3)
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.side_effect = [
+            mock_plenty_api_items_response_de[:3],
+            mock_plenty_api_items_response_de[3:]
+        ]
+        shared.plenty_api_instance = mock_plenty
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'title'])
+
+        refines = [call[1]['refine'] for call in
+                   mock_get_items.call_args_list]
+        assert refines == [{'id': '1,2,3'}, {'id': '4'}]
+        assert len(filler.match_item) == 4
+
+    def with_failed_batch(sample_variations: list,
+                          mock_plenty_api_items_response_de: list,
+                          monkeypatch, mock_get_items):
+        monkeypatch.setattr(plenty, 'ITEM_ID_BATCH_SIZE', 3)
+        shared.plenty_variations = sample_variations
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.side_effect = [
+            mock_plenty_api_items_response_de[:3], None
+        ]
+        shared.plenty_api_instance = mock_plenty
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'title'])
+
+        assert filler.matchtables is False
+
+
+def describe_get_attribute_ids() -> None:
+    def with_both_attributes():
+        shared.color_attribute_id = 2
+        shared.size_attribute_id = 3
+
+        assert plenty.get_attribute_ids(header=['id', 'size', 'color']) ==\
+            [2, 3]
+
+    def with_single_column():
+        shared.color_attribute_id = 2
+        shared.size_attribute_id = 3
+
+        assert plenty.get_attribute_ids(header=['id', 'size']) == [3]
+
+    def with_unconfigured_attribute():
+        shared.color_attribute_id = 2
+        shared.size_attribute_id = 0
+
+        result = plenty.get_attribute_ids(header=['id', 'color', 'size'])
+
+        shared.size_attribute_id = 3
+        assert result == [2]
+
+
+def describe_reference_data() -> None:
+    def with_prefetched_data(sample_variations: list,
+                             mock_plenty_api_attribute_response: list,
+                             mocker):
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        shared.plenty_api_instance = mock_plenty
+        shared.reference_data = {
+            'attributes': mock_plenty_api_attribute_response}
+        get_attributes = mocker.patch.object(plenty, 'get_attributes')
+
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'color'])
+
+        shared.reference_data = {}
+        get_attributes.assert_not_called()
+        assert filler.match_attribute['2']['13'] == 'rot'
+
+    def with_concurrent_requests(sample_variations: list,
+                                 mock_plenty_api_items_response_de: list,
+                                 mock_plenty_api_attribute_response: list,
+                                 mock_plenty_api_manufacturers_response: list,
+                                 mocker, mock_get_items):
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        shared.max_workers = 3
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.return_value = mock_plenty_api_items_response_de
+        mocker.patch.object(plenty, 'get_attributes',
+                            return_value=mock_plenty_api_attribute_response)
+        mock_plenty.plenty_api_get_manufacturers.return_value =\
+            mock_plenty_api_manufacturers_response
+        shared.plenty_api_instance = mock_plenty
+
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=GSHEET_HEADER)
+
+        shared.max_workers = 1
+        assert filler.matchtables is True
+        assert filler.match_brand['1'] == 'Test_company_1'
+        assert filler.match_attribute['3']['25'] == 'XL'
+
+    def with_failed_manufacturers(sample_variations: list,
+                                  mock_plenty_api_items_response_de: list,
+                                  mock_get_items):
+        shared.plenty_variations = sample_variations
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.return_value = mock_plenty_api_items_response_de
+        mock_plenty.plenty_api_get_manufacturers.side_effect =\
+            RuntimeError('Authentication failed')
+        shared.plenty_api_instance = mock_plenty
+
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'brand'])
+
+        assert filler.matchtables is False
+
+
+def describe_stale_cache() -> None:
+    def with_new_manufacturer(sample_variations: list,
+                              mock_plenty_api_items_response_de: list,
+                              mock_plenty_api_manufacturers_response: list,
+                              mock_get_items, tmp_path):
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        shared.reference_cache = ReferenceCache(path=str(tmp_path))
+        # Cached before the manufacturer of item 3 was created
+        shared.reference_cache.store(
+            entity='manufacturers',
+            data=mock_plenty_api_manufacturers_response[:2])
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.return_value = mock_plenty_api_items_response_de
+        mock_plenty.plenty_api_get_manufacturers.return_value =\
+            mock_plenty_api_manufacturers_response
+        shared.plenty_api_instance = mock_plenty
+
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'brand'])
+        result = filler.get_columns(header=['id', 'brand'])
+        stored = shared.reference_cache.load(entity='manufacturers')
+
+        shared.reference_cache = None
+        mock_plenty.plenty_api_get_manufacturers.assert_called_once()
+        assert filler.match_brand['3'] == 'Test_company_3'
+        assert 'Test_company_3' in result['brand']
+        assert stored == mock_plenty_api_manufacturers_response
+
+    def with_unknown_manufacturer(sample_variations: list,
+                                  mock_plenty_api_items_response_de: list,
+                                  mock_plenty_api_manufacturers_response: list,
+                                  mock_get_items, tmp_path):
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        shared.reference_cache = ReferenceCache(path=str(tmp_path))
+        shared.match_tables = plenty.MatchTables()
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.return_value = mock_plenty_api_items_response_de
+        mock_plenty.plenty_api_get_manufacturers.return_value =\
+            mock_plenty_api_manufacturers_response[:2]
+        shared.plenty_api_instance = mock_plenty
+
+        for _ in range(2):
+            filler = ColumnValuesFiller(variations=sample_variations,
+                                        header=['id', 'brand'])
+            assert '3' not in filler.match_brand
+
+        shared.reference_cache = None
+        shared.match_tables = None
+        # the initial request and a single refetch within the run
+        assert mock_plenty.plenty_api_get_manufacturers.call_count == 2
+
+    def with_new_attribute_value(sample_variations: list,
+                                 mock_plenty_api_attribute_response: list,
+                                 mocker, tmp_path):
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        shared.color_attribute_id = 2
+        color = mock_plenty_api_attribute_response[0]
+        shared.reference_cache = ReferenceCache(path=str(tmp_path))
+        # Cached before the value green (14) was added to the color
+        shared.reference_cache.store(entity='attributes', data=[
+            dict(color, values=[value for value in color['values']
+                                if value['id'] != 14])])
+        shared.plenty_api_instance = unittest.mock.Mock(
+            spec=plenty_api.PlentyApi)
+        get_attributes = mocker.patch.object(plenty, 'get_attributes',
+                                             return_value=[color])
+
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'color'])
+        result = filler.get_columns(header=['id', 'color'])
+        stored = shared.reference_cache.load(entity='attributes')
+
+        shared.reference_cache = None
+        get_attributes.assert_called_once_with([2])
+        assert 'grün' in result['color']
+        assert stored == [color]
+
+
+def describe_get_columns() -> None:
+    def with_single_column(sample_variations: list):
+        shared.plenty_variations = sample_variations
+        shared.warehouse_id = 1
+        shared.plenty_api_instance = unittest.mock.Mock(
+            spec=plenty_api.PlentyApi)
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'inventory'])
+
+        result = filler.get_columns(header=['id', 'inventory',
+                                            'availability', 'condition'])
+
+        assert result == {
+            'id': ['1234x', '1345x', '1456x', '1567x'],
+            'inventory': ['10', '11', '0', '0'],
+            'availability': ['in stock', 'in stock', 'out of stock',
+                             'out of stock'],
+            'condition': ['new', 'new', 'new', 'new']
+        }
+        assert filler.get_value(name='inventory') == result['inventory']
+
+    def with_failed_column(sample_variations: list):
+        del sample_variations[2]['stock']
+        shared.plenty_variations = sample_variations
+        shared.warehouse_id = 1
+        shared.plenty_api_instance = unittest.mock.Mock(
+            spec=plenty_api.PlentyApi)
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'inventory'])
+
+        result = filler.get_columns(header=['id', 'inventory',
+                                            'item_group_id'])
+
+        assert result == {
+            'id': ['1234x', '1345x', '1456x', '1567x'],
+            'inventory': [],
+            'item_group_id': ['1', '2', '3', '4']
+        }
+
+    def with_invalid_column(sample_variations: list):
+        shared.plenty_variations = sample_variations
+        shared.plenty_api_instance = unittest.mock.Mock(
+            spec=plenty_api.PlentyApi)
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id'])
+
+        assert filler.get_value(name='invalid') == 'invalid column'
+
+
+def describe_column_registry() -> None:
+    def with_every_catalog_column():
+        assert sorted(plenty.COLUMN_REGISTRY) == sorted(GSHEET_HEADER)
+        for spec in plenty.COLUMN_REGISTRY.values():
+            assert all(name in plenty.INTERMEDIATE_REGISTRY
+                       for name in spec.requires)
+
+    def with_shared_intermediate(sample_variations: list, mocker):
+        shared.plenty_variations = sample_variations
+        shared.warehouse_id = 1
+        shared.plenty_api_instance = unittest.mock.Mock(
+            spec=plenty_api.PlentyApi)
+        select = mocker.spy(plenty.columnar, 'select_sub_resource_values')
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'inventory',
+                                            'availability'])
+
+        filler.get_columns(header=['id', 'inventory', 'availability'])
+        filler.get_columns(header=['inventory'])
+
+        assert select.call_count == 1
+
+    def with_unrequested_intermediates(sample_variations: list):
+        shared.plenty_variations = sample_variations
+        shared.plenty_api_instance = unittest.mock.Mock(
+            spec=plenty_api.PlentyApi)
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'item_group_id'])
+
+        filler.get_columns(header=['id', 'item_group_id'])
+
+        assert filler.intermediates == {}
+
+    def with_failed_intermediate(sample_variations: list, mocker):
+        del sample_variations[2]['stock']
+        shared.plenty_variations = sample_variations
+        shared.plenty_api_instance = unittest.mock.Mock(
+            spec=plenty_api.PlentyApi)
+        stock = mocker.spy(ColumnValuesFiller, 'get_stock_values')
+        mocker.patch.dict(plenty.INTERMEDIATE_REGISTRY, {'stock': stock})
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'inventory'])
+
+        result = filler.get_columns(header=['inventory', 'availability'])
+
+        assert result == {'inventory': [], 'availability': []}
+        assert stock.call_count == 1
+
+
+def describe_build_variation_index() -> None:
+    def with_stock(sample_variations: list):
+        variation = sample_variations[0]
+        variation['stock'].append({'warehouseId': 2, 'netStock': 4})
+
+        result = plenty.build_variation_index(
+            variation=VariationRecord(variation=variation), resource='stock')
+
+        assert result == {1: 10, 2: 4}
+
+    def with_attributes(sample_variations: list):
+        result = plenty.build_variation_index(
+            variation=VariationRecord(variation=sample_variations[0]),
+            resource='attributes')
+
+        assert result == {2: 13, 3: 23}
+
+    def with_properties(sample_variations: list):
+        result = plenty.build_variation_index(
+            variation=VariationRecord(variation=sample_variations[0]),
+            resource='properties')
+
+        assert list(result) == [2, 3]
+        assert plenty.get_relation_value(relation_values=result[3],
+                                         lang='en') == 'Cotton'
+        assert plenty.get_relation_value(relation_values=result[2],
+                                         lang='en') is None
+        assert plenty.get_relation_value(
+            relation_values=result[2], lang='en',
+            fallback=True) == 'https://test_link.com?num=1'
+
+
+def describe_match_tables() -> None:
+    def with_shared_tables(sample_variations: list,
+                           mock_plenty_api_items_response_de: list,
+                           mock_plenty_api_manufacturers_response: list,
+                           mock_get_items):
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.return_value = mock_plenty_api_items_response_de
+        mock_plenty.plenty_api_get_manufacturers.return_value =\
+            mock_plenty_api_manufacturers_response
+        shared.plenty_api_instance = mock_plenty
+        shared.match_tables = plenty.MatchTables()
+
+        ColumnValuesFiller(variations=sample_variations,
+                           header=['id', 'title'])
+        filler = ColumnValuesFiller(variations=sample_variations[:1],
+                                    header=['id', 'title', 'brand'])
+
+        shared.match_tables = None
+        mock_get_items.assert_called_once()
+        mock_plenty.plenty_api_get_manufacturers.assert_called_once()
+        assert list(filler.match_item) == ['33']
+        assert filler.match_brand['1'] == 'Test_company_1'
+
+    def with_failed_request(sample_variations: list,
+                            mock_plenty_api_items_response_de: list,
+                            mock_get_items):
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.side_effect = [
+            [], mock_plenty_api_items_response_de]
+        shared.plenty_api_instance = mock_plenty
+        shared.match_tables = plenty.MatchTables()
+
+        failed = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'title'])
+        retried = ColumnValuesFiller(variations=sample_variations,
+                                     header=['id', 'title'])
+
+        shared.match_tables = None
+        assert failed.matchtables is False
+        assert retried.matchtables is True
+        assert mock_get_items.call_count == 2
+
+    def with_additional_attribute(sample_variations: list,
+                                  mock_plenty_api_attribute_response: list,
+                                  mocker):
+        shared.plenty_variations = sample_variations
+        shared.lang = 'de'
+        shared.color_attribute_id = 2
+        shared.size_attribute_id = 3
+        shared.plenty_api_instance = unittest.mock.Mock(
+            spec=plenty_api.PlentyApi)
+        shared.match_tables = plenty.MatchTables()
+        get_attributes = mocker.patch.object(
+            plenty, 'get_attributes', side_effect=[
+                mock_plenty_api_attribute_response[:1],
+                mock_plenty_api_attribute_response[1:]])
+
+        ColumnValuesFiller(variations=sample_variations,
+                           header=['id', 'color'])
+        ColumnValuesFiller(variations=sample_variations,
+                           header=['id', 'color'])
+        filler = ColumnValuesFiller(variations=sample_variations,
+                                    header=['id', 'color', 'size'])
+
+        shared.match_tables = None
+        assert get_attributes.call_count == 2
+        assert get_attributes.call_args_list[0][0][0] == [2]
+        assert sorted(filler.match_attribute) == ['2', '3']
+        assert filler.match_attribute['2']['13'] == 'rot'
+
+
+def describe_select_image_url() -> None:
+    @pytest.fixture
+    def images() -> tuple:
+        return (
+            (2, 'https://test_image.com/image_2.jpg',
+             (('marketplace', 4.01), ('mandant', 12345))),
+            (0, 'https://test_image.com/image_0.jpg',
+             (('marketplace', 5),)),
+            (1, 'https://test_image.com/image_1.jpg',
+             (('marketplace', 4.01),)),
+            (3, 'https://test_image.com/image_3.jpg',
+             (('marketplace', 4.01),))
+        )
+
+    def with_matching_images(images: tuple):
+        key = plenty.get_image_match_key(
+            criteria={'type': 'marketplace', 'value': '4.01'})
+
+        assert plenty.select_image_url(images=images, key=key) ==\
+            'https://test_image.com/image_1.jpg'
+
+    def with_integer_value(images: tuple):
+        key = plenty.get_image_match_key(
+            criteria={'type': 'mandant', 'value': '12345'})
+
+        assert plenty.select_image_url(images=images, key=key) ==\
+            'https://test_image.com/image_2.jpg'
+
+    def without_matching_image(images: tuple):
+        key = plenty.get_image_match_key(
+            criteria={'type': 'marketplace', 'value': '4'})
+
+        assert plenty.select_image_url(images=images, key=key) == ''
+
+    def without_images():
+        key = plenty.get_image_match_key(
+            criteria={'type': 'marketplace', 'value': '4'})
+
+        assert plenty.select_image_url(images=(), key=key) == ''
+
+
+def describe_broadcast_per_item() -> None:
+    def with_variations_of_one_item(sample_variations: list):
+        sample_variations[1]['itemId'] = 1
+        records = [VariationRecord(variation=var)
+                   for var in sample_variations]
+        cell = unittest.mock.Mock(
+            side_effect=lambda var, item: f'variation_{var.id}')
+
+        item_cell = plenty.broadcast_per_item(cell=cell)
+        result = [item_cell(record, None) for record in records]
+
+        assert result == ['variation_33', 'variation_33', 'variation_55',
+                          'variation_66']
+        assert cell.call_count == 3
+
+
+def describe_item_language_tables() -> None:
+    @pytest.fixture
+    def multilingual_items() -> list:
+        return [{
+            'id': 1, 'manufacturerId': 3,
+            'texts': [{'lang': 'en', 'name1': 'Trousers',
+                       'description': 'Cotton'},
+                      {'lang': 'de', 'name1': 'Hose',
+                       'description': 'Baum-\nwolle'}],
+            'itemProperties': [
+                {'propertyId': 3, 'propertySelectionId': 8,
+                 'propertySelection': [
+                     {'id': 7, 'lang': 'de', 'name': 'Damen'},
+                     {'id': 8, 'lang': 'de', 'name': 'Herren'},
+                     {'id': 8, 'lang': 'en', 'name': 'Men'}],
+                 'valueTexts': []},
+                {'propertyId': 4, 'propertySelectionId': None,
+                 'valueTexts': [{'lang': 'de', 'value': 'Erwachsener'},
+                                {'lang': 'en', 'value': 'Adult'}]}]
+        }]
+
+    def with_text_in_second_language(sample_variations: list,
+                                      multilingual_items: list,
+                                      mock_get_items):
+        shared.plenty_variations = sample_variations[:1]
+        shared.lang = 'de'
+        shared.item_name_number = 1
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.return_value = multilingual_items
+        shared.plenty_api_instance = mock_plenty
+        header = ['id', 'title', 'description']
+        filler = ColumnValuesFiller(variations=sample_variations[:1],
+                                    header=header)
+
+        result = filler.get_columns(header=header)
+
+        assert result['title'] == ['Hose']
+        assert result['description'] == ['Baum-wolle']
+
+    def with_selection_property(sample_variations: list,
+                                multilingual_items: list, mock_get_items):
+        shared.plenty_variations = sample_variations[:1]
+        shared.lang = 'de'
+        shared.gender_property_id = 3
+        shared.age_property_id = 4
+        mock_plenty = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        mock_get_items.return_value = multilingual_items
+        shared.plenty_api_instance = mock_plenty
+        header = ['id', 'gender', 'age_group']
+        filler = ColumnValuesFiller(variations=sample_variations[:1],
+                                    header=header)
+
+        result = filler.get_columns(header=header)
+
+        assert result['gender'] == ['Herren']
+        assert result['age_group'] == ['Adult']
+        assert filler.tables.property_selections[(3, 8, 'en')] == 'Men'
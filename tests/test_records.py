@@ -0,0 +1,62 @@
+from facebook_feed_sync.packages.records import (
+    VariationRecord, parse_variations, to_records
+)
+
+
+def describe_variation_record():
+    def with_all_sub_resources():
+        variation = {
+            'id': 33, 'number': '1234x', 'itemId': 1, 'isMain': False,
+            'weightG': 250, 'mainWarehouseId': 1,
+            'stock': [{'itemId': 1, 'netStock': 10, 'physicalStock': 12,
+                       'variationId': 33, 'warehouseId': 1}],
+            'variationSalesPrices': [{'salesPriceId': 1, 'price': 9.5,
+                                      'variationId': 33}],
+            'variationAttributeValues': [{'attributeId': 2, 'valueId': 13,
+                                          'attribute': {'id': 2}}],
+            'properties': [{'id': 12, 'propertyId': 2, 'relationValues': [
+                {'id': 12, 'lang': 'DE', 'value': 'https://test.com'}]}],
+            'images': [{'position': 1, 'url': 'https://test.com/1.jpg',
+                        'availabilities': [{'type': 'marketplace',
+                                            'value': 4}]}]
+        }
+
+        record = VariationRecord(variation=variation)
+
+        assert (record.id, record.number, record.item_id) == (33, '1234x', 1)
+        assert record.weight == 250
+        assert record.stock == ((1, 10),)
+        assert record.prices == ((1, 9.5),)
+        assert record.attributes == ((2, 13),)
+        assert record.properties == ((2, (('de', 'https://test.com'),)),)
+        assert record.images == ((1, 'https://test.com/1.jpg',
+                                  (('marketplace', 4),)),)
+        assert not hasattr(record, '__dict__')
+
+    def without_sub_resources():
+        record = VariationRecord(variation={'id': 1, 'number': 'a'})
+
+        assert record.stock is None
+        assert record.images is None
+
+
+def describe_parse_variations():
+    def with_raw_variations():
+        variations = [{'id': 1, 'number': 'a'}, {'id': 2, 'number': 'b'}]
+
+        result = parse_variations(variations=variations)
+
+        assert [record.number for record in result] == ['a', 'b']
+        assert variations == []
+
+
+def describe_to_records():
+    def with_records_and_raw_variations():
+        record = VariationRecord(variation={'id': 1, 'number': 'a'})
+        variations = [record, {'id': 2, 'number': 'b'}]
+
+        result = to_records(variations=variations)
+
+        assert result[0] is record
+        assert result[1].number == 'b'
+        assert variations[1] == {'id': 2, 'number': 'b'}
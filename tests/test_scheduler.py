@@ -0,0 +1,193 @@
+import threading
+import time
+import unittest.mock
+import plenty_api
+
+from facebook_feed_sync.packages import fetch
+from facebook_feed_sync.packages.scheduler import (
+    RequestScheduler, ScheduledPlentyApi
+)
+
+
+def limit_headers(short_left: int, long_left: int = 1000,
+                  decay: int = 10) -> dict:
+    return {
+        'X-Plenty-Global-Short-Period-Calls-Left': str(short_left),
+        'X-Plenty-Global-Short-Period-Decay': str(decay),
+        'X-Plenty-Global-Long-Period-Calls-Left': str(long_left),
+        'X-Plenty-Global-Long-Period-Decay': '3600'
+    }
+
+
+def describe_request_scheduler():
+    def with_enough_calls_left():
+        scheduler = RequestScheduler(max_workers=4, reserve=5)
+        scheduler.acquire()
+
+        scheduler.release(headers=limit_headers(short_left=40))
+
+        assert scheduler.concurrency == 4
+        assert scheduler.resume_at == 0
+        assert scheduler.active == 0
+
+    def with_few_calls_left():
+        scheduler = RequestScheduler(max_workers=4, reserve=5)
+        scheduler.acquire()
+
+        scheduler.release(headers=limit_headers(short_left=7))
+
+        assert scheduler.concurrency == 2
+        assert scheduler.resume_at == 0
+
+    def with_reserved_calls_left():
+        scheduler = RequestScheduler(max_workers=4, reserve=5)
+        scheduler.acquire()
+
+        scheduler.release(headers=limit_headers(short_left=5, decay=20))
+
+        assert scheduler.concurrency == 1
+        assert 19 < scheduler.resume_at - time.monotonic() <= 20
+
+    def with_long_period_exhausted():
+        scheduler = RequestScheduler(max_workers=4, reserve=5)
+        scheduler.acquire()
+
+        scheduler.release(headers=limit_headers(short_left=40, long_left=2))
+
+        assert scheduler.resume_at - time.monotonic() > 3500
+
+    def without_limit_headers():
+        scheduler = RequestScheduler(max_workers=4, reserve=5)
+        scheduler.acquire()
+        scheduler.release(headers=limit_headers(short_left=7))
+        scheduler.acquire()
+
+        scheduler.release(headers=None)
+
+        assert scheduler.concurrency == 2
+
+    def with_throttled_request():
+        scheduler = RequestScheduler(max_workers=4)
+
+        scheduler.throttle(headers={})
+
+        assert scheduler.concurrency == 1
+        assert scheduler.resume_at > time.monotonic()
+
+    def with_queued_requests():
+        scheduler = RequestScheduler(max_workers=1)
+        scheduler.acquire()
+        acquired = threading.Event()
+
+        def request():
+            scheduler.acquire()
+            acquired.set()
+        thread = threading.Thread(target=request)
+        thread.start()
+
+        assert not acquired.wait(timeout=0.1)
+        scheduler.release()
+        assert acquired.wait(timeout=1)
+        thread.join()
+
+
+def describe_scheduled_plenty_api():
+    def with_request_method():
+        api = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        api.plenty_api_get_manufacturers.return_value = [{'id': 1}]
+        scheduler = RequestScheduler()
+        scheduled = ScheduledPlentyApi(api=api, scheduler=scheduler)
+
+        result = scheduled.plenty_api_get_manufacturers()
+
+        assert result == [{'id': 1}]
+        assert scheduler.active == 0
+
+    def with_failing_request_method():
+        api = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        api.plenty_api_get_items.side_effect = RuntimeError('failed')
+        scheduler = RequestScheduler()
+        scheduled = ScheduledPlentyApi(api=api, scheduler=scheduler)
+
+        try:
+            scheduled.plenty_api_get_items()
+        except RuntimeError:
+            pass
+
+        assert scheduler.active == 0
+
+    def with_attribute():
+        api = unittest.mock.Mock(spec=plenty_api.PlentyApi)
+        api.url = 'https://test.plentymarkets-cloud01.com'
+        scheduled = ScheduledPlentyApi(api=api, scheduler=RequestScheduler())
+
+        assert scheduled.url == 'https://test.plentymarkets-cloud01.com'
+
+
+def describe_request_page():
+    def with_response_headers(mocker):
+        response = unittest.mock.Mock(status_code=200,
+                                      headers=limit_headers(short_left=6))
+        response.json.return_value = {'entries': [], 'isLastPage': True}
+        mocker.patch('requests.get', return_value=response)
+        scheduler = RequestScheduler(max_workers=4, reserve=5)
+        api = ScheduledPlentyApi(
+            api=unittest.mock.Mock(url='https://test', creds={}),
+            scheduler=scheduler)
+
+        fetch.request_page(api=api, route=fetch.VARIATION_ROUTE, query={},
+                           page=1)
+
+        assert scheduler.concurrency == 1
+        assert scheduler.active == 0
+
+    def with_throttled_request(mocker):
+        throttled = unittest.mock.Mock(status_code=429, headers={})
+        response = unittest.mock.Mock(status_code=200, headers={})
+        response.json.return_value = {'entries': [{'id': 1}],
+                                      'isLastPage': True}
+        get = mocker.patch('requests.get', side_effect=[throttled, response])
+        scheduler = RequestScheduler()
+        throttle = mocker.patch.object(scheduler, 'throttle')
+        api = ScheduledPlentyApi(
+            api=unittest.mock.Mock(url='https://test', creds={}),
+            scheduler=scheduler)
+
+        result = fetch.request_page(api=api, route=fetch.VARIATION_ROUTE,
+                                    query={}, page=1)
+
+        assert result['entries'] == [{'id': 1}]
+        assert get.call_count == 2
+        throttle.assert_called_once()
+
+
+def describe_scheduled_downloads():
+    def with_variations_of_single_worker(mocker):
+        response = unittest.mock.Mock(status_code=200,
+                                      headers=limit_headers(short_left=6))
+        response.json.return_value = {'entries': [{'id': 1}],
+                                      'isLastPage': True}
+        mocker.patch('requests.get', return_value=response)
+        scheduler = RequestScheduler(max_workers=4, reserve=5)
+        api = ScheduledPlentyApi(
+            api=unittest.mock.Mock(url='https://test', creds={}),
+            scheduler=scheduler)
+
+        fetch.get_variations(api=api, refine={'isActive': True}, workers=1)
+
+        assert scheduler.concurrency == 1
+
+    def with_items(mocker):
+        response = unittest.mock.Mock(status_code=200,
+                                      headers=limit_headers(short_left=6))
+        response.json.return_value = {'entries': [{'id': 1}],
+                                      'isLastPage': True}
+        mocker.patch('requests.get', return_value=response)
+        scheduler = RequestScheduler(max_workers=4, reserve=5)
+        api = ScheduledPlentyApi(
+            api=unittest.mock.Mock(url='https://test', creds={}),
+            scheduler=scheduler)
+
+        fetch.get_items(api=api, refine={'id': '1'})
+
+        assert scheduler.concurrency == 1